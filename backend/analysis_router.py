@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Escalate to the vision model below this OpenCV confidence
+CONFIDENCE_THRESHOLD = float(os.environ.get("ROUTER_CONFIDENCE_THRESHOLD", 0.6))
+# Max vision-model calls per rolling minute (0 disables escalation)
+LLM_BUDGET_PER_MINUTE = int(os.environ.get("ROUTER_LLM_BUDGET_PER_MINUTE", 10))
+# Uploads only leave the server once a vision backend is configured explicitly
+VISION_ENABLED = bool(os.environ.get("API_KEY") or os.environ.get("ANALYZER_BASE_URL"))
+
+# Typical share of a clean floor plan covered by wall pixels
+MIN_WALL_COVERAGE = 0.02
+MAX_WALL_COVERAGE = 0.30
+
+
+# ---------- CONFIDENCE SCORING ----------
+
+def score_confidence(analysis):
+    """Score how much the OpenCV analysis can be trusted, from 0.0 to 1.0.
+
+    Combines three signals from the contour pass:
+    - contour quality: share of raw contours kept, and whether wall area
+      is spread over several walls rather than one merged blob
+    - wall coverage: fraction of the image covered by the wall mask
+    - openings: plans where doors/windows were found are usually clean
+    """
+    stats = analysis.get("stats", {})
+    # Segment walls are split/merged centerlines, so score the contour-pass
+    # wall count to keep the score independent of wall_mode
+    walls = int(stats.get("wall_contours", len(analysis["walls"])))
+    if walls == 0:
+        return 0.0
+
+    # Share of raw contours that survived as walls/openings; noisy scans
+    # produce many tiny fragments that get filtered out
+    kept = walls + len(analysis["doors"]) + len(analysis["windows"])
+    raw = max(int(stats.get("raw_contours", kept)), 1)
+    fragment_score = min(1.0, 2.0 * kept / raw)
+    # One contour holding nearly all wall area means the wall network was
+    # not separated (often one giant polygon)
+    dominance = float(stats.get("largest_wall_ratio", 0.0))
+    dominance_score = 1.0 - max(0.0, dominance - 0.6) / 0.4
+    contour_score = 0.5 * fragment_score + 0.5 * dominance_score
+
+    coverage = float(stats.get("wall_coverage", 0.0))
+    if MIN_WALL_COVERAGE <= coverage <= MAX_WALL_COVERAGE:
+        coverage_score = 1.0
+    elif coverage < MIN_WALL_COVERAGE:
+        coverage_score = coverage / MIN_WALL_COVERAGE
+    else:
+        coverage_score = max(0.0, 1.0 - (coverage - MAX_WALL_COVERAGE) / 0.3)
+
+    openings = len(analysis["doors"]) + len(analysis["windows"])
+    opening_score = min(1.0, 0.5 + openings / 10.0)
+
+    return round(
+        0.5 * contour_score + 0.3 * coverage_score + 0.2 * opening_score, 3
+    )
+
+
+# ---------- BUDGET ----------
+
+class BudgetLimiter:
+    """Allows at most ``per_minute`` acquisitions in any rolling 60 s window."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] >= 60.0:
+                self.calls.popleft()
+            if len(self.calls) >= self.per_minute:
+                return False
+            self.calls.append(now)
+            return True
+
+
+llm_budget = BudgetLimiter(LLM_BUDGET_PER_MINUTE)
+
+
+# ---------- ROUTER ----------
+
+def route_analysis(image_path, analysis):
+    """Keep the OpenCV analysis unless it scores low, then try the vision model.
+
+    Escalation is opt-in: it only happens when ``API_KEY`` or
+    ``ANALYZER_BASE_URL`` is set. It is also skipped for segment walls,
+    which the vision model cannot produce, and when the per-minute budget
+    is spent. Any vision-model failure falls back to the OpenCV result.
+    The returned analysis carries ``analysis_source`` and ``confidence``.
+    """
+    confidence = score_confidence(analysis)
+    analysis["confidence"] = confidence
+    analysis["analysis_source"] = "opencv"
+
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return analysis
+
+    if not VISION_ENABLED:
+        print(f"🔒 Vision model not configured, keeping OpenCV result ({confidence})")
+        return analysis
+
+    if analysis.get("wall_mode") == "segments":
+        print(f"📏 Segment walls requested, keeping OpenCV result ({confidence})")
+        return analysis
+
+    if not llm_budget.try_acquire():
+        print(f"💸 Vision budget spent, keeping OpenCV result ({confidence})")
+        return analysis
+
+    print(f"🧠 Low confidence ({confidence}), escalating to vision model")
+    try:
+        # Imported lazily so the OpenCV path never pays for the HTTP client
+        from blueprint_to_3d import get_analyzer
+
+        vision = get_analyzer().analyze(image_path)
+    except Exception as e:
+        print(f"⚠️ Vision analysis failed, keeping OpenCV result: {e}")
+        return analysis
+
+    if not vision["walls"]:
+        return analysis
+
+    # Geometry is normalized, so keep the real image size and our scale.
+    # Rooms stay OpenCV's: room_index labels refer to that room list.
+    for key in (
+        "image_width",
+        "image_height",
+        "scale_factor",
+        "wall_height",
+        "wall_mode",
+        "rooms",
+        "room_index",
+        "analysis_params",
+    ):
+        if key in analysis:
+            vision[key] = analysis[key]
+    vision["stats"] = analysis.get("stats", {})
+    vision["confidence"] = confidence
+    vision["analysis_source"] = "vision"
+    return vision
@@ -3,11 +3,20 @@ from flask_cors import CORS
 import os
 import subprocess
 import uuid
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import threading
+import time
+import tempfile
 import json
-import cv2
-import numpy as np
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from analysis_router import route_analysis
+from edits import apply_edits, write_delta
+from textures import prepare_textures
+from blender_jobs import EXPORT_EXTENSIONS, artifact_path
+from storage import StorageManager, locate, shard_key, stored_path
 
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:5173"])
@@ -16,162 +25,140 @@ UPLOAD_FOLDER = "uploads"
 OUTPUT_FOLDER = "outputs"
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "dxf"}
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg"}
+
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 16))
+MAX_BATCH_MB = int(os.environ.get("MAX_BATCH_MB", 1024))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# "contours": outline polygons; "segments": straight centerline segments
+WALL_MODES = {"contours", "segments"}
+DEFAULT_WALL_MODE = os.environ.get("WALL_MODE", "contours")
+# "progressive": DXF buildings also export a base asset + per-floor instances
+OUTPUT_MODES = {"single", "progressive"}
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["OUTPUT_FOLDER"] = OUTPUT_FOLDER
+# Werkzeug rejects bodies whose Content-Length exceeds this before reading
+# them; single files are additionally capped at MAX_UPLOAD_BYTES.
+app.config["MAX_CONTENT_LENGTH"] = MAX_BATCH_MB * 1024 * 1024
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+BLENDER_TIMEOUT = 300
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", os.cpu_count() or 2))
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 8))
+MAX_BATCH_ITEMS = int(os.environ.get("MAX_BATCH_ITEMS", 500))
+# Batches get their own pools so long Blender chunks never starve /api/upload
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", max(1, MAX_WORKERS // 2)))
+
 processing_status = {}
+batches = {}
+# task_id -> analysis/config JSON written by the analysis stage
+analysis_files = {}
+# Serializes PATCH edits so concurrent requests never interleave revisions
+edit_lock = threading.Lock()
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+# Batch analysis and batch generation use separate pools, so filled chunks
+# start in Blender while the rest of the batch is still being analyzed
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+batch_generators = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+
+def task_pinned(key):
+    """Queued/running tasks and batches keep their files through sweeps."""
+    if key in batches:
+        return batches[key]["status"] in ("queued", "processing")
+    return processing_status.get(key, {}).get("status") in ("queued", "processing")
+
+
+def task_evicted(key):
+    analysis_files.pop(key, None)
+    if key in processing_status:
+        processing_status[key] = {
+            "status": "expired",
+            "progress": 0,
+            "error": "Task files were removed by the storage lifecycle",
+        }
+
+
+storage = StorageManager(
+    {"upload": UPLOAD_FOLDER, "output": OUTPUT_FOLDER},
+    is_pinned=task_pinned,
+    on_evict=task_evicted,
+).start()
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# ---------- IMAGE ANALYSIS (OLD PIPELINE) ----------
-
-# def create_analysis_from_blueprint(
-#     image_path,
-#     wall_height=3.0,
-#     scale_factor=0.02,
-#     min_wall_area=400,
-#     morph_kernel_size=5,
-# ):
-def create_analysis_from_blueprint(
-    image_path,
-    wall_height=2.0,  # *** CHANGED: Reduced from 3.0 ***
-    scale_factor=0.015,  # *** CHANGED: Slightly larger for better proportions ***
-    min_wall_area=400,
-    morph_kernel_size=5,
-):
-    print(f"🧾 Analyzing blueprint: {image_path}")
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError("Failed to load image for analysis.")
-
-    h, w = img.shape[:2]
-
-    blur = cv2.GaussianBlur(img, (5, 5), 0)
-    thresh = cv2.adaptiveThreshold(
-        blur,
-        255,
-        cv2.ADAPTIVE_THRESH_MEAN_C,
-        cv2.THRESH_BINARY_INV,
-        15,
-        5,
-    )
+def parse_formats(value):
+    """Parse a comma-separated ``formats`` field; GLB is always exported first."""
+    formats = ["glb"]
+    for fmt in (value or "").split(","):
+        fmt = fmt.strip().lower()
+        if not fmt or fmt in formats:
+            continue
+        if fmt not in EXPORT_EXTENSIONS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        formats.append(fmt)
+    return formats
+
+
+def parse_options(values):
+    """Per-job generation options from request args/form values."""
+    wall_mode = (values.get("wall_mode") or DEFAULT_WALL_MODE).lower()
+    if wall_mode not in WALL_MODES:
+        raise ValueError(f"Unsupported wall_mode: {wall_mode}")
+    output_mode = (values.get("output_mode") or "single").lower()
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unsupported output_mode: {output_mode}")
+    return {
+        "formats": parse_formats(values.get("formats")),
+        "wall_mode": wall_mode,
+        "output_mode": output_mode,
+    }
 
-    kernel = np.ones((morph_kernel_size, morph_kernel_size), np.uint8)
-    morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
-    morph = cv2.morphologyEx(morph, cv2.MORPH_OPEN, kernel, iterations=1)
 
-    contours, hierarchy = cv2.findContours(
-        morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
-    print(f"🔎 Found {len(contours)} raw contours")
+def is_image_file(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in IMAGE_EXTENSIONS
 
-    walls = []
-    doors = []
-    windows = []
-    all_wall_points = []
 
-    def norm_pt(pt):
-        x, y = pt
-        return [float(x) / w, float(y) / h]
+def stream_upload(source, input_path, keep_buffer=False):
+    """Copy an upload stream to disk in chunks, hashing it on the fly.
 
-    for i, cnt in enumerate(contours):
-        area = cv2.contourArea(cnt)
-        if area < min_wall_area:
-            continue
+    Returns ``(sha256_hex, size_bytes, buffer)``; ``buffer`` holds the raw
+    bytes when ``keep_buffer`` is set so images can be decoded without
+    reading the file back. Streams over ``MAX_UPLOAD_BYTES`` are rejected
+    as soon as they cross the limit.
+    """
+    limit = MAX_UPLOAD_BYTES
+    digest = hashlib.sha256()
+    buffer = bytearray() if keep_buffer else None
+    size = 0
 
-        peri = cv2.arcLength(cnt, True)
-        eps = max(2.0, 0.01 * peri)
-        approx = cv2.approxPolyDP(cnt, eps, True)
-        pts = [tuple(p[0]) for p in approx]
-
-        x, y, w_rect, h_rect = cv2.boundingRect(approx)
-        rect_area = w_rect * h_rect
-
-        if (
-            len(pts) == 4
-            and rect_area < area * 0.6
-            and rect_area < 5000
-            and (min(w_rect, h_rect) < max(w_rect, h_rect) * 0.35)
-        ):
-            if max(w_rect, h_rect) / float(min(w_rect, h_rect) + 1e-6) > 1.5:
-                center = (x + w_rect / 2, y + h_rect / 2)
-                doors.append(
-                    {
-                        "id": f"door_{len(doors)}",
-                        "center": [center[0] / w, center[1] / h],
-                        "width": w_rect / float(w),
-                        "height": h_rect / float(h),
-                        "area_px": rect_area,
-                    }
-                )
-                continue
-            else:
-                center = (x + w_rect / 2, y + h_rect / 2)
-                windows.append(
-                    {
-                        "id": f"window_{len(windows)}",
-                        "center": [center[0] / w, center[1] / h],
-                        "width": w_rect / float(w),
-                        "height": h_rect / float(h),
-                        "area_px": rect_area,
-                    }
-                )
-                continue
+    with open(input_path, "wb") as dst:
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                break
+            digest.update(chunk)
+            dst.write(chunk)
+            if buffer is not None:
+                buffer.extend(chunk)
 
-        norm_poly = [norm_pt(p) for p in pts]
-        walls.append(
-            {
-                "id": f"wall_{len(walls)}",
-                "vertices": norm_poly,
-                "thickness": 0.01,
-            }
-        )
-        all_wall_points.extend(pts)
-
-    if len(all_wall_points) > 0:
-        all_pts_arr = np.array(all_wall_points)
-        min_x, min_y = np.min(all_pts_arr, axis=0)
-        max_x, max_y = np.max(all_pts_arr, axis=0)
-        room_bounds = {
-            "id": "room_0",
-            "bounds": {
-                "x": float(min_x) / w,
-                "y": float(min_y) / h,
-                "width": float(max_x - min_x) / w,
-                "height": float(max_y - min_y) / h,
-            },
-            "center": [
-                (min_x + max_x) / (2 * w),
-                (min_y + max_y) / (2 * h),
-            ],
-        }
-        rooms = [room_bounds]
-    else:
-        rooms = []
-
-    analysis = {
-        "image_width": w,
-        "image_height": h,
-        "scale_factor": scale_factor,
-        "wall_height": wall_height,
-        "walls": walls,
-        "doors": doors,
-        "windows": windows,
-        "rooms": rooms,
-    }
+    if size > limit:
+        os.remove(input_path)
+        raise RequestEntityTooLarge()
 
-    print(
-        f"✅ Analysis: walls={len(walls)}, doors={len(doors)}, "
-        f"windows={len(windows)}, rooms={len(rooms)}"
-    )
-    return analysis
+    return digest.hexdigest(), size, buffer
 
 
 # ---------- DXF CONFIG (NEW PIPELINE) ----------
@@ -198,7 +185,246 @@ def create_analysis_from_dxf(
 
 # ---------- BACKGROUND WORKER ----------
 
-def process_blueprint_async(task_id, input_path, output_path):
+GENERATOR_SCRIPTS = {
+    "dxf": "generate_model.py",
+    "image": "generate_model_image.py",
+}
+PIPELINE_LABELS = {"dxf": "DXF", "image": "IMG"}
+
+
+def find_blender():
+    blender_path = r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe"
+    if not os.path.exists(blender_path):
+        blender_path = "blender"
+    return blender_path
+
+
+def run_generator(pipeline, args, timeout=BLENDER_TIMEOUT, on_line=None):
+    """Run a generator script in Blender and return a ``CompletedProcess``.
+
+    Stdout is read line by line while Blender runs, and each line is passed
+    to ``on_line`` so progress markers can be acted on immediately.
+    """
+    cmd = [
+        find_blender(),
+        "--background",
+        "--python",
+        GENERATOR_SCRIPTS[pipeline],
+        "--",
+        *args,
+    ]
+
+    print(f"🎬 Running ({PIPELINE_LABELS[pipeline]}): {' '.join(cmd)}")
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        shell=True,
+    )
+    stderr = []
+    stderr_reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()))
+    stderr_reader.daemon = True
+    stderr_reader.start()
+    killer = threading.Timer(timeout, proc.kill)
+    killer.start()
+
+    stdout = []
+    try:
+        for line in proc.stdout:
+            stdout.append(line)
+            if on_line:
+                on_line(line.rstrip("\n"))
+        proc.wait()
+    finally:
+        killer.cancel()
+    stderr_reader.join()
+
+    result = subprocess.CompletedProcess(
+        cmd, proc.returncode, "".join(stdout), "".join(stderr)
+    )
+
+    print(f"Return code: {result.returncode}")
+    if result.stdout:
+        print("STDOUT:\n", result.stdout)
+    if result.stderr:
+        print("STDERR:\n", result.stderr)
+    return result
+
+
+def analyze_input(input_path, image_bytes=None, options=None):
+    """Run the analysis stage for one upload and save its JSON document.
+
+    ``image_bytes`` is the already-received upload body for image inputs and
+    ``options`` the parsed job options (see ``parse_options``).
+    Returns ``(pipeline, analysis_data, analysis_file)``.
+    """
+    worker_ready.wait()
+    options = options or {}
+    formats = options.get("formats", ["glb"])
+    ext = os.path.splitext(input_path)[1].lower()
+
+    # DXF branch
+    if ext == ".dxf":
+        analysis_data = create_analysis_from_dxf(
+            input_path,
+            target_size=30.0,
+            wall_height=3.2,
+            wall_thickness=0.25,
+            floors=3,
+            floor_height=3.5,
+            slab_thickness=0.3,
+        )
+        analysis_data["export_formats"] = list(formats)
+        analysis_data["output_mode"] = options.get("output_mode", "single")
+
+        analysis_file = input_path.rsplit(".", 1)[0] + "_dxf_config.json"
+        with open(analysis_file, "w") as f:
+            json.dump(analysis_data, f, indent=2)
+
+        print(f"💾 Saved DXF config: {analysis_file}")
+        return "dxf", analysis_data, analysis_file
+
+    # IMAGE branch (png/jpg/jpeg); OpenCV loads on the worker side only
+    from image_analysis import create_analysis_from_blueprint
+
+    analysis_data = create_analysis_from_blueprint(
+        input_path,
+        # wall_height=3.0,
+        # scale_factor=0.02,
+        wall_height=2.5,  # *** HIGHLIGHTED: Shorter walls ***
+        scale_factor=0.015,  # *** HIGHLIGHTED: Better scale ***
+        # min_wall_area, morph_kernel_size and threshold parameters come
+        # from the resolution preset tuned by tune_analysis.py
+        wall_mode=options.get("wall_mode", DEFAULT_WALL_MODE),
+        image_bytes=image_bytes,
+    )
+    analysis_data = route_analysis(input_path, analysis_data)
+    analysis_data["export_formats"] = list(formats)
+
+    analysis_file = input_path.rsplit(".", 1)[0] + "_analysis.json"
+    with open(analysis_file, "w") as f:
+        json.dump(analysis_data, f, indent=2)
+
+    print(f"💾 Saved image analysis: {analysis_file}")
+    return "image", analysis_data, analysis_file
+
+
+def preview_base(task_id):
+    return stored_path(app.config["OUTPUT_FOLDER"], f"{task_id}_preview")
+
+
+def write_task_preview(task_id, pipeline, analysis_data):
+    """Rasterize the analysis to a small top-down preview before generation.
+
+    Preview failures are logged and never fail the task.
+    """
+    from preview import analysis_primitives, dxf_primitives, write_previews
+
+    try:
+        if pipeline == "dxf":
+            prims = dxf_primitives(analysis_data["dxf_path"])
+        else:
+            prims = analysis_primitives(analysis_data)
+        write_previews(prims, preview_base(task_id))
+        print(f"🖼️ Preview ready: {task_id}")
+    except Exception as e:
+        print(f"⚠️ Preview failed for {task_id}: {e}")
+
+
+def task_status(task_id):
+    status = dict(processing_status.get(task_id, {"status": "queued", "progress": 0}))
+    if locate(app.config["OUTPUT_FOLDER"], f"{task_id}_preview.png"):
+        status["preview_url"] = f"/api/preview/{task_id}"
+    return status
+
+
+def chunk_listener(tasks_by_output):
+    """``on_line`` handler marking progressive chunks available per task."""
+
+    def on_line(line):
+        if not line.startswith("CHUNK_READY "):
+            return
+        chunk = json.loads(line[len("CHUNK_READY ") :])
+        task_id = tasks_by_output.get(chunk.pop("output"))
+        if task_id is None:
+            return
+        status = processing_status[task_id]
+        status["manifest_file"] = chunk.pop("manifest")
+        status.setdefault("chunks", []).append(chunk)
+        print(f"🧩 Chunk ready: {task_id} floor {chunk['index']}")
+
+    return on_line
+
+
+def completed_status(pipeline, analysis_data, output_path):
+    file_size = os.path.getsize(output_path)
+    if pipeline == "dxf":
+        analysis = {
+            "pipeline": "dxf",
+            "model_size_bytes": file_size,
+            "floors": analysis_data["floors"],
+            "wall_height": analysis_data["wall_height"],
+        }
+    else:
+        analysis = {
+            "pipeline": "image",
+            "walls_detected": len(analysis_data["walls"]),
+            "doors_detected": len(analysis_data["doors"]),
+            "windows_detected": len(analysis_data["windows"]),
+            "rooms_detected": len(analysis_data["rooms"]),
+            "model_size_bytes": file_size,
+            "scale_factor": analysis_data["scale_factor"],
+            "analysis_source": analysis_data.get("analysis_source", "opencv"),
+            "confidence": analysis_data.get("confidence"),
+        }
+
+    print(
+        f"✅ SUCCESS ({PIPELINE_LABELS[pipeline]}): "
+        f"{output_path} created ({file_size} bytes)"
+    )
+    artifacts = []
+    for fmt in analysis_data.get("export_formats", ["glb"]):
+        path = artifact_path(output_path, fmt)
+        if os.path.exists(path):
+            artifact = {
+                "format": fmt,
+                "file": os.path.basename(path),
+                "size_bytes": os.path.getsize(path),
+            }
+            # The OBJ exporter writes its materials to a sibling .mtl file
+            mtl_path = os.path.splitext(path)[0] + ".mtl"
+            if fmt == "obj" and os.path.exists(mtl_path):
+                artifact["material_file"] = os.path.basename(mtl_path)
+            artifacts.append(artifact)
+
+    status = {
+        "status": "completed",
+        "progress": 100,
+        "model_file": os.path.basename(output_path),
+        "artifacts": artifacts,
+        "analysis": analysis,
+    }
+
+    manifest_path = os.path.splitext(output_path)[0] + "_manifest.json"
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            status["chunks"] = json.load(f)["chunks"]
+        status["manifest_file"] = os.path.basename(manifest_path)
+    return status
+
+
+def error_status(error_msg):
+    return {
+        "status": "error",
+        "progress": 0,
+        "error": error_msg,
+    }
+
+
+def process_blueprint_async(
+    task_id, input_path, output_path, image_bytes=None, options=None
+):
     print(f"🚀 PROCESSING: {task_id}")
     try:
         processing_status[task_id] = {
@@ -206,215 +432,625 @@ def process_blueprint_async(task_id, input_path, output_path):
             "progress": 10,
         }
 
-        ext = os.path.splitext(input_path)[1].lower()
-        blender_path = r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe"
-        if not os.path.exists(blender_path):
-            blender_path = "blender"
-
-        # DXF branch
-        if ext == ".dxf":
-            analysis_data = create_analysis_from_dxf(
-                input_path,
-                target_size=30.0,
-                wall_height=3.2,
-                wall_thickness=0.25,
-                floors=3,
-                floor_height=3.5,
-                slab_thickness=0.3,
-            )
+        pipeline, analysis_data, analysis_file = analyze_input(
+            input_path, image_bytes=image_bytes, options=options
+        )
+        analysis_files[task_id] = analysis_file
+        write_task_preview(task_id, pipeline, analysis_data)
+        processing_status[task_id]["progress"] = 50
+
+        result = run_generator(
+            pipeline,
+            [analysis_file, output_path],
+            on_line=chunk_listener({os.path.basename(output_path): task_id}),
+        )
 
-            analysis_file = input_path.rsplit(".", 1)[0] + "_dxf_config.json"
-            with open(analysis_file, "w") as f:
-                json.dump(analysis_data, f, indent=2)
-
-            print(f"💾 Saved DXF config: {analysis_file}")
-            processing_status[task_id]["progress"] = 40
-
-            cmd = [
-                blender_path,
-                "--background",
-                "--python",
-                "generate_model.py",
-                "--",
-                analysis_file,
-                output_path,
-            ]
-
-            print(f"🎬 Running (DXF): {' '.join(cmd)}")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-                shell=True,
+        if result.returncode == 0 and os.path.exists(output_path):
+            processing_status[task_id] = completed_status(
+                pipeline, analysis_data, output_path
+            )
+        else:
+            processing_status[task_id] = error_status(
+                f"Failed: {result.stderr or 'Unknown error'}"
             )
 
-            print(f"Return code: {result.returncode}")
-            if result.stdout:
-                print("STDOUT:\n", result.stdout)
-            if result.stderr:
-                print("STDERR:\n", result.stderr)
-
-            if result.returncode == 0 and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                processing_status[task_id] = {
-                    "status": "completed",
-                    "progress": 100,
-                    "model_file": os.path.basename(output_path),
-                    "analysis": {
-                        "pipeline": "dxf",
-                        "model_size_bytes": file_size,
-                        "floors": analysis_data["floors"],
-                        "wall_height": analysis_data["wall_height"],
-                    },
-                }
-                print(
-                    f"✅ SUCCESS (DXF): {output_path} created ({file_size} bytes)"
-                )
-            else:
-                error_msg = f"Failed: {result.stderr or 'Unknown error'}"
-                processing_status[task_id] = {
-                    "status": "error",
-                    "progress": 0,
-                    "error": error_msg,
-                }
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        print(f"❌ {error_msg}")
+        processing_status[task_id] = error_status(error_msg)
+
 
-        # IMAGE branch (png/jpg/jpeg)
+def rebuild_model_async(task_id, output_path):
+    """Re-export a task's full model from its edited analysis."""
+    print(f"🔁 REBUILDING: {task_id}")
+    try:
+        with open(analysis_files[task_id]) as f:
+            analysis_data = json.load(f)
+
+        result = run_generator("image", [analysis_files[task_id], output_path])
+        if result.returncode == 0 and os.path.exists(output_path):
+            status = completed_status("image", analysis_data, output_path)
+            status["revision"] = analysis_data.get("revision", 0)
+            processing_status[task_id] = status
         else:
-            analysis_data = create_analysis_from_blueprint(
-                input_path,
-                # wall_height=3.0,
-                # scale_factor=0.02,
-                wall_height=2.5,  # *** HIGHLIGHTED: Shorter walls ***
-                scale_factor=0.015,  # *** HIGHLIGHTED: Better scale ***
-                min_wall_area=400,
-                morph_kernel_size=5,
-            )
-            processing_status[task_id]["progress"] = 40
-
-            analysis_file = input_path.rsplit(".", 1)[0] + "_analysis.json"
-            with open(analysis_file, "w") as f:
-                json.dump(analysis_data, f, indent=2)
-
-            print(f"💾 Saved image analysis: {analysis_file}")
-            processing_status[task_id]["progress"] = 50
-
-            cmd = [
-                blender_path,
-                "--background",
-                "--python",
-                "generate_model_image.py",
-                "--",
-                analysis_file,
-                output_path,
-            ]
-
-            print(f"🎬 Running (IMG): {' '.join(cmd)}")
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-                shell=True,
+            processing_status[task_id] = error_status(
+                f"Failed: {result.stderr or 'Unknown error'}"
             )
 
-            print(f"Return code: {result.returncode}")
-            if result.stdout:
-                print("STDOUT:\n", result.stdout)
-            if result.stderr:
-                print("STDERR:\n", result.stderr)
-
-            if result.returncode == 0 and os.path.exists(output_path):
-                file_size = os.path.getsize(output_path)
-                processing_status[task_id] = {
-                    "status": "completed",
-                    "progress": 100,
-                    "model_file": os.path.basename(output_path),
-                    "analysis": {
-                        "pipeline": "image",
-                        "walls_detected": len(analysis_data["walls"]),
-                        "doors_detected": len(analysis_data["doors"]),
-                        "windows_detected": len(analysis_data["windows"]),
-                        "rooms_detected": len(analysis_data["rooms"]),
-                        "model_size_bytes": file_size,
-                        "scale_factor": analysis_data["scale_factor"],
-                    },
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        print(f"❌ {error_msg}")
+        processing_status[task_id] = error_status(error_msg)
+
+
+# ---------- BATCH WORKER ----------
+
+def analyze_batch_item(item):
+    task_id = item["task_id"]
+    processing_status[task_id] = {"status": "processing", "progress": 10}
+    try:
+        pipeline, analysis_data, analysis_file = analyze_input(
+            item["input_path"], options=item["options"]
+        )
+        analysis_files[task_id] = analysis_file
+        write_task_preview(task_id, pipeline, analysis_data)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        print(f"❌ {task_id}: {error_msg}")
+        processing_status[task_id] = error_status(error_msg)
+        return None
+
+    processing_status[task_id]["progress"] = 50
+    return dict(
+        item,
+        pipeline=pipeline,
+        analysis_data=analysis_data,
+        analysis_file=analysis_file,
+    )
+
+
+def generate_batch_chunk(batch_id, pipeline, chunk_index, items):
+    """Build and export several models of one pipeline in a single Blender run."""
+    manifest_path = stored_path(
+        app.config["UPLOAD_FOLDER"],
+        f"{batch_id}_{pipeline}_{chunk_index}_batch.json",
+    )
+    with open(manifest_path, "w") as f:
+        json.dump(
+            [
+                {"config": item["analysis_file"], "output": item["output_path"]}
+                for item in items
+            ],
+            f,
+            indent=2,
+        )
+
+    for item in items:
+        processing_status[item["task_id"]]["progress"] = 60
+
+    try:
+        result = run_generator(
+            pipeline,
+            ["--batch", manifest_path],
+            timeout=BLENDER_TIMEOUT * len(items),
+            on_line=chunk_listener(
+                {
+                    os.path.basename(item["output_path"]): item["task_id"]
+                    for item in items
                 }
-                print(
-                    f"✅ SUCCESS (IMG): {output_path} created ({file_size} bytes)"
+            ),
+        )
+        failure = f"Failed: {result.stderr or 'Model was not exported'}"
+    except Exception as e:
+        failure = f"Error: {str(e)}"
+        print(f"❌ Batch chunk {batch_id}/{pipeline}/{chunk_index}: {failure}")
+
+    for item in items:
+        if os.path.exists(item["output_path"]):
+            processing_status[item["task_id"]] = completed_status(
+                pipeline, item["analysis_data"], item["output_path"]
+            )
+        else:
+            processing_status[item["task_id"]] = error_status(failure)
+
+
+def process_batch_async(batch_id, items):
+    print(f"🚀 PROCESSING BATCH: {batch_id} ({len(items)} items)")
+    batches[batch_id]["status"] = "processing"
+    try:
+        # Same-pipeline jobs share one generator process per chunk, so Blender
+        # startup is paid once per BATCH_CHUNK_SIZE models instead of once each.
+        # A chunk is submitted as soon as it fills up, so generation of early
+        # chunks overlaps with analysis of the rest of the batch.
+        pending = {}
+        chunk_counts = {}
+        futures = []
+
+        def submit_chunk(pipeline):
+            chunk = pending.pop(pipeline)
+            index = chunk_counts.get(pipeline, 0)
+            chunk_counts[pipeline] = index + 1
+            futures.append(
+                batch_generators.submit(
+                    generate_batch_chunk, batch_id, pipeline, index, chunk
                 )
-            else:
-                error_msg = f"Failed: {result.stderr or 'Unknown error'}"
-                processing_status[task_id] = {
-                    "status": "error",
-                    "progress": 0,
-                    "error": error_msg,
-                }
+            )
+
+        analyses = [batch_executor.submit(analyze_batch_item, item) for item in items]
+        for future in as_completed(analyses):
+            item = future.result()
+            if item is None:
+                continue
+            pending.setdefault(item["pipeline"], []).append(item)
+            if len(pending[item["pipeline"]]) >= BATCH_CHUNK_SIZE:
+                submit_chunk(item["pipeline"])
+
+        for pipeline in list(pending):
+            submit_chunk(pipeline)
+
+        for future in futures:
+            future.result()
+
+        batches[batch_id]["status"] = "completed"
+        print(f"✅ BATCH DONE: {batch_id}")
 
     except Exception as e:
         error_msg = f"Error: {str(e)}"
-        print(f"❌ {error_msg}")
-        processing_status[task_id] = {
-            "status": "error",
-            "progress": 0,
-            "error": error_msg,
-        }
+        print(f"❌ Batch {batch_id}: {error_msg}")
+        batches[batch_id]["status"] = "error"
+        for item in items:
+            status = processing_status.get(item["task_id"], {}).get("status")
+            if status in ("queued", "processing"):
+                processing_status[item["task_id"]] = error_status(error_msg)
+
+
+def batch_summary(batch_id):
+    batch = batches[batch_id]
+    tasks = {task_id: task_status(task_id) for task_id in batch["task_ids"]}
+    counts = {"queued": 0, "processing": 0, "completed": 0, "error": 0}
+    for task in tasks.values():
+        counts[task["status"]] = counts.get(task["status"], 0) + 1
+
+    total = len(tasks)
+    # Failed items count as finished for the aggregate.
+    progress = (
+        sum(
+            100 if task["status"] == "error" else task["progress"]
+            for task in tasks.values()
+        )
+        / total
+        if total
+        else 100
+    )
+
+    return {
+        "batch_id": batch_id,
+        "status": batch["status"],
+        "progress": round(progress, 1),
+        "total": total,
+        "counts": counts,
+        "items": [
+            {"task_id": task_id, "filename": batch["filenames"][task_id], **tasks[task_id]}
+            for task_id in batch["task_ids"]
+        ],
+    }
+
+
+# ---------- WARM-UP ----------
+
+WARMUP = os.environ.get("WARMUP", "1") != "0"
+worker_ready = threading.Event()
+warmup_state = {"seconds": None, "error": None}
+
+
+def warm_pipelines():
+    """Run one tiny synthetic image analysis and one DXF parse.
+
+    Covers OpenCV, rooms, segments and preview rendering, so their import
+    and first-call costs are paid before the first real job.
+    """
+    import cv2
+    import ezdxf
+    import numpy as np
+    from image_analysis import create_analysis_from_blueprint
+    from preview import analysis_primitives, dxf_primitives, write_previews
+
+    plan = np.full((96, 96), 255, np.uint8)
+    cv2.rectangle(plan, (12, 12), (84, 84), 0, 4)
+    cv2.line(plan, (48, 12), (48, 84), 0, 4)
+    encoded = cv2.imencode(".png", plan)[1].tobytes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for wall_mode in sorted(WALL_MODES):
+            analysis = create_analysis_from_blueprint(
+                "warmup.png",
+                min_wall_area=20,
+                wall_mode=wall_mode,
+                image_bytes=encoded,
+            )
+        write_previews(analysis_primitives(analysis), os.path.join(tmp, "img"))
+
+        doc = ezdxf.new()
+        doc.modelspace().add_lwpolyline(
+            [(0, 0), (4, 0), (4, 3), (0, 3)], close=True
+        )
+        doc.modelspace().add_line((2, 0), (2, 3))
+        dxf_path = os.path.join(tmp, "warmup.dxf")
+        doc.saveas(dxf_path)
+        write_previews(dxf_primitives(dxf_path), os.path.join(tmp, "dxf"))
+
+
+def warm_up():
+    """Prepare the worker off the import path before the first real job.
+
+    Always prepares the shared textures; with WARMUP enabled it also runs
+    ``warm_pipelines``. Jobs wait on ``worker_ready``; failures are logged
+    and the worker is marked ready anyway, so a broken warm-up never
+    blocks jobs.
+    """
+    started = time.time()
+    try:
+        # Shrink/re-encode shared textures once so every export embeds the small copy
+        prepare_textures()
+        if WARMUP:
+            warm_pipelines()
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        print(f"⚠️ Warm-up failed: {e}")
+
+    warmup_state["seconds"] = round(time.time() - started, 3)
+    worker_ready.set()
+    print(f"🔥 Worker ready after {warmup_state['seconds']}s warm-up")
+
+
+threading.Thread(target=warm_up, daemon=True).start()
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify(
+        {"error": f"File too large (max {MAX_UPLOAD_MB} MB)"}
+    ), 413
 
 
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
     print("📤 UPLOAD")
 
-    if "file" not in request.files:
+    # Raw-body uploads (``?filename=plan.png``) are streamed straight from the
+    # socket; multipart uploads go through the form parser first.
+    if request.args.get("filename") and not request.mimetype.startswith(
+        "multipart/"
+    ):
+        # The body is the file itself; a multipart length also counts the
+        # boundary and part headers, so stream_upload checks those instead
+        if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+            raise RequestEntityTooLarge()
+        filename = request.args["filename"]
+        source = request.stream
+    elif "file" in request.files:
+        filename = request.files["file"].filename
+        source = request.files["file"].stream
+    else:
         return jsonify({"error": "No file uploaded"}), 400
 
-    file = request.files["file"]
-    if file and allowed_file(file.filename):
+    try:
+        options = parse_options(request.values)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if filename and allowed_file(filename):
         task_id = str(uuid.uuid4())
-        filename = secure_filename(file.filename)
+        filename = secure_filename(filename)
         input_filename = f"{task_id}_{filename}"
         output_filename = f"{task_id}_model.glb"
 
-        input_path = os.path.join(app.config["UPLOAD_FOLDER"], input_filename)
-        output_path = os.path.join(app.config["OUTPUT_FOLDER"], output_filename)
-
-        file.save(input_path)
+        input_path = stored_path(app.config["UPLOAD_FOLDER"], input_filename)
+        output_path = stored_path(app.config["OUTPUT_FOLDER"], output_filename)
 
-        thread = threading.Thread(
-            target=process_blueprint_async,
-            args=(task_id, input_path, output_path),
+        content_hash, size, image_bytes = stream_upload(
+            source, input_path, keep_buffer=is_image_file(filename)
         )
-        thread.daemon = True
-        thread.start()
 
         processing_status[task_id] = {"status": "queued", "progress": 0}
+        executor.submit(
+            process_blueprint_async,
+            task_id,
+            input_path,
+            output_path,
+            bytes(image_bytes) if image_bytes is not None else None,
+            options,
+        )
         return jsonify(
-            {"task_id": task_id, "message": "Processing started"}
+            {
+                "task_id": task_id,
+                "content_hash": content_hash,
+                "size_bytes": size,
+                **options,
+                "message": "Processing started",
+            }
         ), 200
 
     return jsonify({"error": "Invalid file"}), 400
 
 
+def save_batch_item(batch_id, filename, source, options):
+    task_id = str(uuid.uuid4())
+    input_path = stored_path(
+        app.config["UPLOAD_FOLDER"], f"{task_id}_{filename}"
+    )
+    content_hash, size, _ = stream_upload(source, input_path)
+
+    return {
+        "task_id": task_id,
+        "filename": filename,
+        "content_hash": content_hash,
+        "size_bytes": size,
+        "input_path": input_path,
+        "options": options,
+        "output_path": stored_path(
+            app.config["OUTPUT_FOLDER"], f"{task_id}_model.glb"
+        ),
+    }
+
+
+def discard_batch_items(items):
+    """Remove the uploads of a rejected batch."""
+    for item in items:
+        if os.path.exists(item["input_path"]):
+            os.remove(item["input_path"])
+
+
+@app.route("/api/batch", methods=["POST"])
+def upload_batch():
+    print("📤 BATCH UPLOAD")
+
+    files = request.files.getlist("files") + request.files.getlist("file")
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+
+    try:
+        options = parse_options(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    batch_id = str(uuid.uuid4())
+    items = []
+    # The batch is accepted all-or-nothing: if any member is rejected, the
+    # members already written are removed before the error is returned.
+    try:
+        for file in files:
+            if not file or not file.filename:
+                continue
+
+            if file.filename.lower().endswith(".zip"):
+                try:
+                    archive = zipfile.ZipFile(file.stream)
+                except zipfile.BadZipFile:
+                    discard_batch_items(items)
+                    return jsonify({"error": f"Invalid zip: {file.filename}"}), 400
+
+                with archive:
+                    for info in archive.infolist():
+                        filename = secure_filename(os.path.basename(info.filename))
+                        if info.is_dir() or not allowed_file(filename):
+                            continue
+                        if len(items) >= MAX_BATCH_ITEMS:
+                            break
+                        if info.file_size > MAX_UPLOAD_BYTES:
+                            raise RequestEntityTooLarge()
+                        with archive.open(info) as source:
+                            items.append(
+                                save_batch_item(batch_id, filename, source, options)
+                            )
+
+            elif allowed_file(file.filename) and len(items) < MAX_BATCH_ITEMS:
+                items.append(
+                    save_batch_item(
+                        batch_id, secure_filename(file.filename), file.stream, options
+                    )
+                )
+    except Exception:
+        discard_batch_items(items)
+        raise
+
+    if not items:
+        return jsonify({"error": "No valid blueprints in upload"}), 400
+
+    for item in items:
+        processing_status[item["task_id"]] = {"status": "queued", "progress": 0}
+
+    batches[batch_id] = {
+        "status": "queued",
+        "task_ids": [item["task_id"] for item in items],
+        "filenames": {item["task_id"]: item["filename"] for item in items},
+    }
+
+    thread = threading.Thread(
+        target=process_batch_async,
+        args=(batch_id, items),
+    )
+    thread.daemon = True
+    thread.start()
+
+    return jsonify(
+        {
+            "batch_id": batch_id,
+            "tasks": [
+                {
+                    "task_id": item["task_id"],
+                    "filename": item["filename"],
+                    "content_hash": item["content_hash"],
+                }
+                for item in items
+            ],
+            "message": "Batch processing started",
+        }
+    ), 200
+
+
+@app.route("/api/batch/<batch_id>", methods=["GET"])
+def get_batch_status(batch_id):
+    if batch_id not in batches:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(batch_summary(batch_id))
+
+
 @app.route("/api/status/<task_id>", methods=["GET"])
 def get_status(task_id):
     if task_id not in processing_status:
         return jsonify(
             {"status": "error", "progress": 0, "error": "Task not found"}
         ), 200
-    return jsonify(processing_status[task_id])
+    storage.touch(task_id)
+    return jsonify(task_status(task_id))
+
+
+@app.route("/api/rooms/<task_id>", methods=["GET"])
+def get_rooms(task_id):
+    analysis_file = analysis_files.get(task_id)
+    if not analysis_file or not os.path.exists(analysis_file):
+        return jsonify({"error": "Analysis not found"}), 404
+
+    storage.touch(task_id)
+    with open(analysis_file) as f:
+        analysis_data = json.load(f)
+    return jsonify(
+        {
+            "rooms": analysis_data.get("rooms", []),
+            "room_index": analysis_data.get("room_index"),
+        }
+    )
+
+
+@app.route("/api/analysis/<task_id>", methods=["GET", "PATCH"])
+def edit_analysis(task_id):
+    """Read or patch a task's image analysis by element id.
+
+    PATCH takes ``{"ops": [...], "rebuild": false}`` where each op is
+    ``{"op": "add", "type": "wall"|"door"|"window", ...fields}``,
+    ``{"op": "move", "id": ..., "offset": [dx, dy]}``,
+    ``{"op": "update", "id": ..., ...fields}`` or
+    ``{"op": "delete", "id": ...}``, all in normalized image coordinates.
+    Only the affected elements are rebuilt, into a small delta GLB whose
+    nodes replace the same-named nodes of the full model. ``rebuild``
+    additionally queues a full Blender re-export in the background.
+    """
+    analysis_file = analysis_files.get(task_id)
+    if not analysis_file or not os.path.exists(analysis_file):
+        return jsonify({"error": "Analysis not found"}), 404
+
+    storage.touch(task_id)
+    if request.method == "GET":
+        with open(analysis_file) as f:
+            return jsonify(json.load(f))
+
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    state = processing_status.get(task_id, {}).get("status")
+    if state in ("queued", "processing"):
+        return jsonify({"error": "Task is still processing"}), 409
+    # A delta only applies on top of a finished model
+    if state != "completed" and not body.get("rebuild"):
+        return jsonify(
+            {"error": "Task has no model to patch; resend with rebuild=true"}
+        ), 409
+
+    with edit_lock:
+        with open(analysis_file) as f:
+            analysis_data = json.load(f)
+        if "walls" not in analysis_data:
+            return jsonify({"error": "Only image analyses can be edited"}), 400
+
+        try:
+            changed, removed = apply_edits(analysis_data, body.get("ops"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        revision = analysis_data["revision"]
+        delta_filename = f"{task_id}_delta_{revision}.glb"
+        write_delta(
+            analysis_data,
+            changed,
+            removed,
+            stored_path(app.config["OUTPUT_FOLDER"], delta_filename),
+        )
+        with open(analysis_file, "w") as f:
+            json.dump(analysis_data, f, indent=2)
+
+    write_task_preview(task_id, "image", analysis_data)
+    print(
+        f"✏️ Edited {task_id} r{revision}: "
+        f"{len(changed)} changed, {len(removed)} removed"
+    )
+
+    if body.get("rebuild"):
+        output_path = stored_path(
+            app.config["OUTPUT_FOLDER"], f"{task_id}_model.glb"
+        )
+        processing_status[task_id] = {
+            "status": "processing",
+            "progress": 50,
+            "revision": revision,
+            "delta_file": delta_filename,
+        }
+        executor.submit(rebuild_model_async, task_id, output_path)
+    else:
+        processing_status[task_id]["revision"] = revision
+        processing_status[task_id]["delta_file"] = delta_filename
+
+    return jsonify(
+        {
+            "task_id": task_id,
+            "revision": revision,
+            "changed": sorted(changed),
+            "removed": removed,
+            "delta_file": delta_filename,
+            "rebuild": bool(body.get("rebuild")),
+        }
+    )
+
+
+@app.route("/api/preview/<task_id>", methods=["GET"])
+def get_preview(task_id):
+    ext = ".svg" if request.args.get("format") == "svg" else ".png"
+    path = locate(
+        app.config["OUTPUT_FOLDER"], f"{secure_filename(task_id)}_preview{ext}"
+    )
+    if path is None:
+        return jsonify({"error": "Preview not ready"}), 404
+    storage.touch(task_id)
+    return send_from_directory(os.path.dirname(path), os.path.basename(path))
 
 
 @app.route("/api/download/<filename>")
 def download_model(filename):
-    try:
-        return send_from_directory(app.config["OUTPUT_FOLDER"], filename)
-    except FileNotFoundError:
+    path = locate(app.config["OUTPUT_FOLDER"], secure_filename(filename))
+    if path is None:
         return jsonify({"error": "File not found"}), 404
+    storage.touch(shard_key(filename))
+    return send_from_directory(os.path.dirname(path), os.path.basename(path))
 
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "healthy"})
+    return jsonify(
+        {
+            "status": "healthy",
+            "ready": worker_ready.is_set(),
+            "warmup_seconds": warmup_state["seconds"],
+            "warmup_error": warmup_state["error"],
+        }
+    )
+
+
+@app.route("/api/ready", methods=["GET"])
+def readiness_check():
+    """503 until warm-up finished, for load balancer readiness probes."""
+    if not worker_ready.is_set():
+        return jsonify({"ready": False}), 503
+    return jsonify({"ready": True})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+
+# Target format -> file extension; every format is exported from the same scene
+EXPORT_EXTENSIONS = {
+    "glb": ".glb",
+    "obj": ".obj",
+    "usd": ".usdc",
+    "stl": ".stl",
+}
+
+
+# -------------------------------------------------
+# JOB ARGUMENTS
+# -------------------------------------------------
+def read_jobs(argv=None):
+    """Return the ``(config_path, output_path)`` pairs passed after ``--``.
+
+    Accepts either ``<config.json> <output.glb>`` for a single model or
+    ``--batch <manifest.json>``, where the manifest is a list of
+    ``{"config": ..., "output": ...}`` entries built in one Blender session.
+    """
+    argv = sys.argv if argv is None else argv
+    if "--" not in argv:
+        raise RuntimeError("Missing '--' and config arguments")
+
+    argv = argv[argv.index("--") + 1 :]
+    if len(argv) >= 2 and argv[0] == "--batch":
+        with open(argv[1], "r") as f:
+            manifest = json.load(f)
+        return [(job["config"], job["output"]) for job in manifest]
+
+    if len(argv) < 2:
+        raise RuntimeError(
+            "Usage: blender ... --python <script> -- <config.json> <output.glb>"
+            " | --batch <manifest.json>"
+        )
+    return [(argv[0], argv[1])]
+
+
+def run_jobs(jobs, build_and_export):
+    """Run every job in this Blender session, isolating per-job failures."""
+    failed = 0
+    for config_path, output_path in jobs:
+        try:
+            if not os.path.exists(config_path):
+                raise RuntimeError(f"Config JSON not found: {config_path}")
+
+            with open(config_path, "r") as f:
+                config = json.load(f)
+
+            build_and_export(config, output_path)
+        except Exception as e:
+            failed += 1
+            print(f"❌ Job failed ({config_path}): {e}", file=sys.stderr)
+
+    if failed:
+        sys.exit(1)
+
+
+# -------------------------------------------------
+# EXPORT
+# -------------------------------------------------
+def artifact_path(output_path, fmt):
+    return os.path.splitext(output_path)[0] + EXPORT_EXTENSIONS[fmt]
+
+
+def export_scene(output_path, formats=("glb",)):
+    """Export the built scene once per requested format next to ``output_path``."""
+    import bpy
+
+    for fmt in formats:
+        path = artifact_path(output_path, fmt)
+        print(f"📦 Exporting {fmt.upper()} to: {path}")
+        if fmt == "glb":
+            bpy.ops.export_scene.gltf(
+                filepath=path,
+                export_format="GLB",
+                export_apply=True,
+            )
+        elif fmt == "obj":
+            bpy.ops.wm.obj_export(filepath=path, apply_modifiers=True)
+        elif fmt == "usd":
+            bpy.ops.wm.usd_export(filepath=path)
+        elif fmt == "stl":
+            bpy.ops.wm.stl_export(filepath=path, apply_modifiers=True)
+        else:
+            raise RuntimeError(f"Unsupported export format: {fmt}")
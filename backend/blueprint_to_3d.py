@@ -2,31 +2,29 @@ import requests
 import json
 import re
 import os
+import base64
+import hashlib
+import asyncio
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Your OpenRouter API key (replace with env var in production)
-API_KEY = "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"
+# OpenRouter API key; the analyzer refuses to call the API without one
+API_KEY = os.environ.get("API_KEY")
+MODEL_NAME = os.environ.get("MODEL_NAME", "allenai/molmo-2-8b:free")
+# Point this at a local mock server to run the analyzer offline
+BASE_URL = os.environ.get("ANALYZER_BASE_URL", "https://openrouter.ai/api/v1")
+CACHE_DIR = os.environ.get(
+    "ANALYZER_CACHE_DIR", os.path.join(os.path.dirname(__file__), "analysis_cache")
+)
 SITE_URL = "https://your-mern-app.com"  # Optional: your app URL
 SITE_NAME = "Blueprint3D"  # Optional: your app name
 
-def analyze_blueprint():
-    """Analyzes blueprint image and generates structured JSON for generate_model_image.py"""
-    
-    response = requests.post(
-        url="https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": SITE_URL,
-            "X-Title": SITE_NAME,
-        },
-        json={  # Use json= instead of data= for automatic serialization
-            "model": "allenai/molmo-2-8b:free",
-            "messages": [{
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": """Analyze this architectural blueprint as a floor plan. Extract precise structured data in VALID JSON format only:
+DEFAULT_IMAGE_URL = "https://live.staticflickr.com/3851/14825276609_098cac593d_b.jpg"
+
+ANALYSIS_PROMPT = """Analyze this architectural blueprint as a floor plan. Extract precise structured data in VALID JSON format only:
 
 {
   "image_width": 1024,
@@ -74,38 +72,308 @@ Rules:
 - Doors/Windows: rectangle centers + dimensions (in normalized units)
 - Scale: assume 1 unit ≈ 10m real-world
 - Output ONLY valid JSON, no explanations!"""
-                    },
+
+
+def repair_json_text(text):
+    """Best-effort repair of a truncated or sloppy JSON object from a model reply.
+
+    Drops anything before the first ``{`` and trailing commas. A cut-off
+    reply is trimmed back to its last complete member (dropping a dangling
+    key, ``key:`` or unterminated string) and its open brackets are closed.
+
+    >>> repair_json_text('{"a": 1, "b": ')
+    '{"a": 1}'
+    >>> repair_json_text('{"walls": [{"id": "wa')
+    '{"walls": [{}]}'
+    >>> repair_json_text('{"walls": [{"id"')
+    '{"walls": [{}]}'
+    >>> repair_json_text('{"walls": [[0.1, 0.2], [0.3')
+    '{"walls": [[0.1, 0.2], [0.3]]}'
+    >>> repair_json_text('Sure! {"a": [1, 2,], "b": 3,}')
+    '{"a": [1, 2], "b": 3}'
+    """
+    start = text.find("{")
+    if start < 0:
+        raise Exception("No valid JSON found in response")
+    text = text[start:]
+
+    stack = []
+    # (position, closers) where cutting the text leaves only complete members
+    cuts = []
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return re.sub(r",\s*([}\]])", r"\1", text[: i + 1])
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+
+    if not in_string:
+        cuts.append((len(text), "".join(reversed(stack))))
+    for end, closers in reversed(cuts):
+        candidate = re.sub(r",\s*([}\]])", r"\1", text[:end].rstrip() + closers)
+        try:
+            json.loads(candidate)
+        except ValueError:
+            continue
+        return candidate
+    raise Exception("No valid JSON found in response")
+
+
+def validate_analysis(data):
+    """Normalize a model analysis to the schema generate_model_image.py expects."""
+    if not isinstance(data, dict):
+        raise Exception("Analysis JSON is not an object")
+
+    def clamp01(v):
+        return min(1.0, max(0.0, float(v)))
+
+    def point(p):
+        return [clamp01(p[0]), clamp01(p[1])]
+
+    walls = []
+    for w in data.get("walls") or []:
+        try:
+            vertices = [point(p) for p in w.get("vertices", [])]
+        except (TypeError, ValueError, IndexError):
+            continue
+        if len(vertices) < 3:
+            continue
+        walls.append(
+            {
+                "id": str(w.get("id") or f"wall_{len(walls)}"),
+                "vertices": vertices,
+                "thickness": float(w.get("thickness", 0.01)),
+            }
+        )
+
+    def openings(items, prefix):
+        result = []
+        for o in items or []:
+            try:
+                result.append(
                     {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": "https://live.staticflickr.com/3851/14825276609_098cac593d_b.jpg"
-                        }
+                        "id": str(o.get("id") or f"{prefix}_{len(result)}"),
+                        "center": point(o["center"]),
+                        "width": float(o.get("width", 0.02)),
+                        "height": float(o.get("height", 0.02)),
                     }
+                )
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+        return result
+
+    rooms = []
+    for r in data.get("rooms") or []:
+        b = r.get("bounds") if isinstance(r, dict) else None
+        try:
+            bounds = {k: clamp01(b[k]) for k in ("x", "y", "width", "height")}
+        except (KeyError, TypeError, ValueError):
+            continue
+        rooms.append({"id": str(r.get("id") or f"room_{len(rooms)}"), "bounds": bounds})
+
+    return {
+        "image_width": int(data.get("image_width") or 1024),
+        "image_height": int(data.get("image_height") or 768),
+        "scale_factor": float(data.get("scale_factor") or 0.1),
+        "wall_height": float(data.get("wall_height") or 3.0),
+        "walls": walls,
+        "doors": openings(data.get("doors"), "door"),
+        "windows": openings(data.get("windows"), "window"),
+        "rooms": rooms,
+    }
+
+
+def extract_analysis_json(content):
+    """Pull the JSON document out of a model reply, repairing it if needed."""
+    try:
+        json_match = re.search(r'\{[\s\S]*\}', content)
+        if not json_match:
+            raise ValueError
+        data = json.loads(json_match.group())
+    except ValueError:
+        data = json.loads(repair_json_text(content))
+    return validate_analysis(data)
+
+
+class BlueprintAnalyzer:
+    """Reusable vision-model client with pooled connections, retries and a disk cache.
+
+    Parsed analyses are cached under ``cache_dir`` keyed by image hash, model
+    name and prompt hash, so analysing the same image again is free.
+    """
+
+    def __init__(
+        self,
+        api_key=API_KEY,
+        model=MODEL_NAME,
+        base_url=BASE_URL,
+        cache_dir=CACHE_DIR,
+        prompt=ANALYSIS_PROMPT,
+        timeout=60,
+        max_retries=3,
+        backoff_factor=1.0,
+        pool_size=10,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = cache_dir
+        self.prompt = prompt
+        self.prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Content-Type": "application/json",
+                "HTTP-Referer": SITE_URL,
+                "X-Title": SITE_NAME,
+            }
+        )
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def image_reference(self, image):
+        """Return ``(image_url, image_hash)`` for a URL or a local file path."""
+        if image.startswith(("http://", "https://", "data:")):
+            return image, hashlib.sha256(image.encode("utf-8")).hexdigest()
+
+        with open(image, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(image)[1].lower().lstrip(".")
+        mime = "image/jpeg" if ext in ("jpg", "jpeg") else f"image/{ext or 'png'}"
+        url = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+        return url, hashlib.sha256(data).hexdigest()
+
+    def cache_path(self, image_hash):
+        key = hashlib.sha256(
+            f"{image_hash}:{self.model}:{self.prompt_hash}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load_cached(self, image_hash):
+        if not self.cache_dir:
+            return None
+        path = self.cache_path(image_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            # A corrupt or partial entry is a miss; the next store replaces it
+            print(f"⚠️ Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def store_cached(self, image_hash, analysis_data):
+        if not self.cache_dir:
+            return
+        path = self.cache_path(image_hash)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(analysis_data, f)
+        os.replace(tmp_path, path)
+
+    def request_payload(self, image_url):
+        return {
+            "model": self.model,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.prompt},
+                    {"type": "image_url", "image_url": {"url": image_url}},
                 ]
             }],
             "temperature": 0.1,  # Low temp for structured output
             "max_tokens": 4000
-        },
-        timeout=60
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"API Error: {response.status_code} - {response.text}")
-    
-    content = response.json()["choices"][0]["message"]["content"]
-    
-    # Extract JSON from response
-    json_match = re.search(r'\{[\s\S]*\}', content)
-    if not json_match:
-        raise Exception("No valid JSON found in response")
-    
-    analysis_data = json.loads(json_match.group())
-    
+        }
+
+    def parse_response(self, response):
+        if response.status_code != 200:
+            raise Exception(f"API Error: {response.status_code} - {response.text}")
+        content = response.json()["choices"][0]["message"]["content"]
+        return extract_analysis_json(content)
+
+    def analyze(self, image, reference=None):
+        """Analyze one blueprint (URL or local path) and return the parsed JSON.
+
+        ``reference`` is an ``image_reference(image)`` result the caller
+        already computed, so a local file is read and encoded only once.
+        """
+        image_url, image_hash = reference or self.image_reference(image)
+
+        cached = self.load_cached(image_hash)
+        if cached is not None:
+            print(f"♻️ Cached analysis: {image}")
+            return cached
+
+        if not self.api_key:
+            raise RuntimeError(
+                "No API key configured; set API_KEY to call the vision model"
+            )
+        response = self.session.post(
+            url=f"{self.base_url}/chat/completions",
+            json=self.request_payload(image_url),
+            timeout=self.timeout,
+        )
+        analysis_data = self.parse_response(response)
+        self.store_cached(image_hash, analysis_data)
+        return analysis_data
+
+    def close(self):
+        self.session.close()
+
+
+_default_analyzer = None
+
+
+def get_analyzer():
+    """Process-wide analyzer so repeated calls share one connection pool."""
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = BlueprintAnalyzer()
+    return _default_analyzer
+
+
+def analyze_blueprint(image=DEFAULT_IMAGE_URL, output_json="floorplan_analysis.json"):
+    """Analyzes blueprint image and generates structured JSON for generate_model_image.py"""
+    analysis_data = get_analyzer().analyze(image)
+
     # Save analysis file
-    output_json = "floorplan_analysis.json"
     with open(output_json, "w") as f:
         json.dump(analysis_data, f, indent=2)
-    
+
     print(f"✅ Analysis saved: {output_json}")
     return output_json
 
@@ -124,7 +392,140 @@ def generate_3d_model(analysis_file, output_glb="building.glb"):
         print(f"❌ Blender error: {result.stderr}")
     return output_glb
 
+
+# ---------- ASYNC BATCH MODE ----------
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second with bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def analyze_batch(
+    images,
+    out_dir=".",
+    concurrency=4,
+    rate=2.0,
+    generate=True,
+    analyzer=None,
+):
+    """Analyze many blueprints concurrently and generate models as results land.
+
+    Up to ``concurrency`` requests are in flight, started at no more than
+    ``rate`` per second. Each finished analysis is validated, saved and
+    queued for Blender immediately, so geometry generation overlaps with
+    the remaining analyses. Returns ``{image: analysis_file or None}``.
+
+    Requests are blocking calls run on a pool sized to ``concurrency``;
+    replies are repaired and validated once they have fully arrived.
+    """
+    analyzer = analyzer or get_analyzer()
+    loop = asyncio.get_running_loop()
+    request_pool = ThreadPoolExecutor(max_workers=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate)
+    geometry_queue = asyncio.Queue()
+    results = {}
+    os.makedirs(out_dir, exist_ok=True)
+
+    async def analyze_one(index, image):
+        async with semaphore:
+            try:
+                # Cache hits cost nothing, so they skip the rate limiter.
+                reference = await loop.run_in_executor(
+                    request_pool, analyzer.image_reference, image
+                )
+                cached = await loop.run_in_executor(
+                    request_pool, analyzer.load_cached, reference[1]
+                )
+                if cached is None:
+                    await bucket.acquire()
+                analysis_data = await loop.run_in_executor(
+                    request_pool, analyzer.analyze, image, reference
+                )
+            except Exception as e:
+                print(f"❌ Analysis failed for {image}: {e}")
+                results[image] = None
+                return
+
+        name = os.path.splitext(os.path.basename(image.split("?")[0]))[0] or "blueprint"
+        analysis_file = os.path.join(out_dir, f"{index:04d}_{name}_analysis.json")
+        with open(analysis_file, "w") as f:
+            json.dump(analysis_data, f, indent=2)
+
+        print(f"✅ Analysis saved: {analysis_file}")
+        results[image] = analysis_file
+        if generate:
+            await geometry_queue.put(analysis_file)
+
+    async def geometry_worker():
+        while True:
+            analysis_file = await geometry_queue.get()
+            try:
+                output_glb = analysis_file.rsplit("_analysis.json", 1)[0] + ".glb"
+                await asyncio.to_thread(generate_3d_model, analysis_file, output_glb)
+            except Exception as e:
+                print(f"❌ Generation failed for {analysis_file}: {e}")
+            finally:
+                geometry_queue.task_done()
+
+    worker = asyncio.create_task(geometry_worker())
+    try:
+        await asyncio.gather(
+            *(analyze_one(i, image) for i, image in enumerate(images))
+        )
+        await geometry_queue.join()
+    finally:
+        worker.cancel()
+        request_pool.shutdown(wait=False)
+
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Blueprint → 3D via a vision model")
+    parser.add_argument("images", nargs="*", help="Image URLs or local paths")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument(
+        "--no-generate", action="store_true", help="Only analyze, skip Blender"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.images:
+        asyncio.run(
+            analyze_batch(
+                args.images,
+                out_dir=args.out_dir,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                generate=not args.no_generate,
+            )
+        )
+        raise SystemExit(0)
+
     try:
         # Step 1: Analyze blueprint
         analysis_file = analyze_blueprint()
@@ -0,0 +1,199 @@
+import copy
+import re
+
+from meshes import element_boxes, write_glb
+from openings import cut_openings
+
+# Element kind -> analysis list holding it
+ELEMENT_LISTS = {"wall": "walls", "door": "doors", "window": "windows"}
+
+# Editable fields per kind, all in normalized image coordinates
+POINT_FIELDS = {"start", "end", "center"}
+SIZE_FIELDS = {"thickness", "width", "height"}
+EDIT_FIELDS = {
+    "wall": {"start", "end", "thickness", "vertices"},
+    "door": {"center", "width", "height"},
+    "window": {"center", "width", "height"},
+}
+REQUIRED_FIELDS = {
+    "wall": ({"start", "end"}, {"vertices"}),
+    "door": ({"center", "width", "height"},),
+    "window": ({"center", "width", "height"},),
+}
+DEFAULT_WALL_THICKNESS = 0.01
+
+
+# ---------- VALIDATION ----------
+
+def _number(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"'{field}' must be a number")
+    return float(value)
+
+
+def _point(value, field):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"'{field}' must be an [x, y] pair")
+    return [_number(value[0], field), _number(value[1], field)]
+
+
+def _field(field, value):
+    if field in POINT_FIELDS:
+        return _point(value, field)
+    if field == "vertices":
+        if not isinstance(value, list) or len(value) < 2:
+            raise ValueError("'vertices' must list at least two [x, y] points")
+        return [_point(v, field) for v in value]
+    size = _number(value, field)
+    if size <= 0:
+        raise ValueError(f"'{field}' must be positive")
+    return size
+
+
+def _fields(kind, op):
+    values = {}
+    for field in EDIT_FIELDS[kind]:
+        if field in op:
+            values[field] = _field(field, op[field])
+    return values
+
+
+# ---------- EDIT OPERATIONS ----------
+
+def find_element(analysis, element_id):
+    """Return ``(kind, index)`` of the element with ``element_id``."""
+    for kind, key in ELEMENT_LISTS.items():
+        for index, element in enumerate(analysis.get(key, [])):
+            if element["id"] == element_id:
+                return kind, index
+    raise ValueError(f"Unknown element id: {element_id}")
+
+
+def _next_id(analysis, kind):
+    suffixes = [
+        int(m.group(1))
+        for element in analysis[ELEMENT_LISTS[kind]]
+        for m in [re.fullmatch(rf"{kind}_(\d+)", element["id"])]
+        if m
+    ]
+    return f"{kind}_{max(suffixes, default=-1) + 1}"
+
+
+def _translate(element, dx, dy):
+    for field in POINT_FIELDS:
+        if field in element:
+            element[field] = [element[field][0] + dx, element[field][1] + dy]
+    if "vertices" in element:
+        element["vertices"] = [[x + dx, y + dy] for x, y in element["vertices"]]
+
+
+def _apply(analysis, op):
+    """Apply one operation; return ``(touched_id, removed)``."""
+    if not isinstance(op, dict):
+        raise ValueError("Each edit must be an object")
+    action = op.get("op")
+    if action not in ("add", "move", "update", "delete"):
+        raise ValueError("'op' must be one of add, move, update, delete")
+
+    if action == "add":
+        kind = op.get("type")
+        if kind not in ELEMENT_LISTS:
+            raise ValueError(f"'type' must be one of {sorted(ELEMENT_LISTS)}")
+        element = _fields(kind, op)
+        if not any(required <= element.keys() for required in REQUIRED_FIELDS[kind]):
+            raise ValueError(f"Missing fields for new {kind}")
+        if kind == "wall":
+            element.setdefault("thickness", DEFAULT_WALL_THICKNESS)
+        element_id = op.get("id") or _next_id(analysis, kind)
+        try:
+            find_element(analysis, element_id)
+        except ValueError:
+            pass
+        else:
+            raise ValueError(f"Element id already exists: {element_id}")
+        analysis[ELEMENT_LISTS[kind]].append(dict(id=element_id, **element))
+        return element_id, False
+
+    element_id = op.get("id")
+    kind, index = find_element(analysis, element_id)
+    items = analysis[ELEMENT_LISTS[kind]]
+
+    if action == "delete":
+        del items[index]
+        return element_id, True
+    if action == "move":
+        dx, dy = _point(op.get("offset"), "offset")
+        _translate(items[index], dx, dy)
+        return element_id, False
+
+    values = _fields(kind, op)
+    if not values:
+        raise ValueError(f"No editable fields given for {element_id}")
+    if ("start" in values or "end" in values) and "vertices" in items[index]:
+        raise ValueError(f"{element_id} is a polygon wall; edit its 'vertices'")
+    items[index].update(values)
+    return element_id, False
+
+
+def _pieces_by_wall(analysis):
+    by_wall = {}
+    for piece in analysis.get("wall_pieces", []):
+        by_wall.setdefault(piece["wall_id"], []).append(
+            (piece["start"], piece["end"], piece["thickness"], piece["z0"], piece["z1"])
+        )
+    return by_wall
+
+
+def apply_edits(analysis, ops):
+    """Apply add/move/update/delete operations to an image analysis.
+
+    Edits are all-or-nothing: ``analysis`` is only modified when every
+    operation is valid. Segment walls get their openings re-cut, and any
+    wall whose cut pieces changed (e.g. because a door moved onto or off
+    it) is reported as changed too. Returns ``(changed, removed)``, where
+    ``changed`` maps element ids to their kind and ``removed`` lists ids.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise ValueError("'ops' must be a non-empty list")
+
+    edited = copy.deepcopy(analysis)
+    touched, removed = set(), set()
+    for op in ops:
+        element_id, was_removed = _apply(edited, op)
+        if was_removed:
+            removed.add(element_id)
+            touched.discard(element_id)
+        else:
+            touched.add(element_id)
+            removed.discard(element_id)
+
+    if "wall_pieces" in edited:
+        before = _pieces_by_wall(edited)
+        cut_openings(edited)
+        after = _pieces_by_wall(edited)
+        touched.update(
+            wall_id
+            for wall_id in before.keys() | after.keys()
+            if before.get(wall_id) != after.get(wall_id)
+        )
+        touched -= removed
+
+    edited["revision"] = edited.get("revision", 0) + 1
+    analysis.clear()
+    analysis.update(edited)
+
+    changed = {}
+    for element_id in touched:
+        changed[element_id] = find_element(analysis, element_id)[0]
+    return changed, sorted(removed)
+
+
+def write_delta(analysis, changed, removed, path):
+    """Write only the changed elements, plus empty nodes for removed ones."""
+    nodes = []
+    for element_id, kind in sorted(changed.items()):
+        _, index = find_element(analysis, element_id)
+        element = analysis[ELEMENT_LISTS[kind]][index]
+        nodes.append((element_id, kind, element_boxes(analysis, kind, element)))
+    nodes.extend((element_id, "wall", []) for element_id in removed)
+    return write_glb(path, nodes)
@@ -10,6 +10,9 @@ import bmesh
 import ezdxf
 from mathutils import Vector
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from blender_jobs import export_scene, read_jobs, run_jobs
+
 
 # -------------------------------------------------
 # SCENE CLEANUP
@@ -20,6 +23,30 @@ def clear_scene():
     for mesh in bpy.data.meshes:
         if mesh.users == 0:
             bpy.data.meshes.remove(mesh)
+    for mat in bpy.data.materials:
+        if mat.users == 0:
+            bpy.data.materials.remove(mat)
+
+
+# -------------------------------------------------
+# MATERIALS
+# -------------------------------------------------
+_wall_material = None
+
+
+def wall_material():
+    """Wall material shared by every floor, built once per Blender process."""
+    global _wall_material
+    if _wall_material is None or _wall_material.name not in bpy.data.materials:
+        mat = bpy.data.materials.new("WallDark")
+        mat.use_nodes = True
+        bsdf = mat.node_tree.nodes["Principled BSDF"]
+        bsdf.inputs["Base Color"].default_value = (0.1, 0.1, 0.1, 1)
+        bsdf.inputs["Roughness"].default_value = 0.7
+        # Survives clear_scene() between batch jobs
+        mat.use_fake_user = True
+        _wall_material = mat
+    return _wall_material
 
 
 # -------------------------------------------------
@@ -129,33 +156,25 @@ def generate_building_from_dxf(config):
     slab.name = "FloorSlab"
     slab.scale = (sx / 2.0, sy / 2.0, slab_thickness / 2.0)
 
-    # Multi-floor duplication
-    floors_objs = []
+    # Material for walls
+    wall_obj.data.materials.append(wall_material())
+
+    # Multi-floor duplication; floors are linked duplicates sharing one wall
+    # mesh and one slab mesh, so exporters write the geometry only once
+    floor_groups = []
     for i in range(floors):
         w = wall_obj.copy()
-        w.data = wall_obj.data.copy()
         w.location.z = i * floor_height
         bpy.context.collection.objects.link(w)
-        floors_objs.append(w)
 
         s = slab.copy()
-        s.data = slab.data.copy()
         s.location.z = i * floor_height
         bpy.context.collection.objects.link(s)
+        floor_groups.append([w, s])
 
     bpy.data.objects.remove(wall_obj)
     bpy.data.objects.remove(slab)
 
-    # Material for walls
-    mat = bpy.data.materials.new("WallDark")
-    mat.use_nodes = True
-    bsdf = mat.node_tree.nodes["Principled BSDF"]
-    bsdf.inputs["Base Color"].default_value = (0.1, 0.1, 0.1, 1)
-    bsdf.inputs["Roughness"].default_value = 0.7
-
-    for o in floors_objs:
-        o.data.materials.append(mat)
-
     # Light & camera
     bpy.ops.object.light_add(type="SUN", location=(30, -30, 50))
     bpy.context.object.data.energy = 4
@@ -166,40 +185,95 @@ def generate_building_from_dxf(config):
     )
     bpy.context.scene.camera = bpy.context.object
 
+    return floor_groups
+
 
 # -------------------------------------------------
-# MAIN
+# PROGRESSIVE OUTPUT
 # -------------------------------------------------
-def main():
-    # Blender passes its own args; we read after "--"
-    argv = sys.argv
-    if "--" not in argv:
-        raise RuntimeError("Missing '--' and config arguments")
-
-    argv = argv[argv.index("--") + 1 :]
-    if len(argv) < 2:
-        raise RuntimeError("Usage: blender ... --python generate_model.py -- <config.json> <output.glb>")
-
-    config_path, output_path = argv[0], argv[1]
+def write_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_floor_chunks(output_path, floor_groups, floor_height):
+    """Export the ground floor once as a base asset and instance it per floor.
+
+    Every floor is a linked duplicate of the same wall and slab meshes, so
+    ``<output>_base.glb`` holds that geometry once, at the origin.
+    ``<output>_manifest.json`` lists one instance of the base per floor,
+    with its translation in glTF's Y-up frame, and each instance is
+    announced on stdout so the server can expose the building before the
+    full model has finished exporting.
+    """
+    stem = os.path.splitext(output_path)[0]
+    manifest_path = f"{stem}_manifest.json"
+    base_path = f"{stem}_base.glb"
+
+    bpy.ops.object.select_all(action="DESELECT")
+    for o in floor_groups[0]:
+        o.select_set(True)
+    bpy.ops.export_scene.gltf(
+        filepath=base_path,
+        export_format="GLB",
+        export_apply=True,
+        use_selection=True,
+    )
+    bpy.ops.object.select_all(action="DESELECT")
+
+    base_file = os.path.basename(base_path)
+    chunks = [
+        {"index": i, "file": base_file, "translation": [0.0, i * floor_height, 0.0]}
+        for i in range(len(floor_groups))
+    ]
+    write_manifest(
+        manifest_path,
+        {
+            "mode": "progressive",
+            "floors": len(floor_groups),
+            "floor_height": floor_height,
+            "base": {"file": base_file},
+            "chunks": chunks,
+            "complete": True,
+        },
+    )
 
-    if not os.path.exists(config_path):
-        raise RuntimeError(f"Config JSON not found: {config_path}")
+    for entry in chunks:
+        print(
+            "CHUNK_READY "
+            + json.dumps(
+                {
+                    "output": os.path.basename(output_path),
+                    "manifest": os.path.basename(manifest_path),
+                    **entry,
+                }
+            ),
+            flush=True,
+        )
 
-    with open(config_path, "r") as f:
-        config = json.load(f)
 
+# -------------------------------------------------
+# MAIN
+# -------------------------------------------------
+def build_and_export(config, output_path):
     clear_scene()
-    generate_building_from_dxf(config)
+    floor_groups = generate_building_from_dxf(config)
 
-    # Export GLB
-    print(f"📦 Exporting GLB to: {output_path}")
-    bpy.ops.export_scene.gltf(
-        filepath=output_path,
-        export_format="GLB",
-        export_apply=True,
-    )
+    if config.get("output_mode") == "progressive":
+        export_floor_chunks(
+            output_path, floor_groups, float(config.get("floor_height", 3.5))
+        )
+
+    export_scene(output_path, config.get("export_formats", ["glb"]))
     print("✅ Export done")
 
 
+def main():
+    # Blender passes its own args; we read after "--"
+    run_jobs(read_jobs(sys.argv), build_and_export)
+
+
 if __name__ == "__main__":
     main()
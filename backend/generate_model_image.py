@@ -1,7 +1,11 @@
 import bpy
 import sys
 import os
-import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from blender_jobs import export_scene, read_jobs, run_jobs
+from meshes import segment_box
+from textures import texture_path
 
 
 # -------------------------------------------------
@@ -13,6 +17,12 @@ def clear_scene():
     for mesh in bpy.data.meshes:
         if mesh.users == 0:
             bpy.data.meshes.remove(mesh)
+    for curve in bpy.data.curves:
+        if curve.users == 0:
+            bpy.data.curves.remove(curve)
+    for mat in bpy.data.materials:
+        if mat.users == 0:
+            bpy.data.materials.remove(mat)
 
 
 # -------------------------------------------------
@@ -58,7 +68,7 @@ def floor_material():
 
     tex = nodes.new("ShaderNodeTexImage")
     tex.image = bpy.data.images.load(
-        os.path.join(os.path.dirname(__file__), "textures", "wood_floor2.jpg")
+        texture_path("wood_floor2.jpg"), check_existing=True
     )
 
     bsdf = nodes.new("ShaderNodeBsdfPrincipled")
@@ -93,6 +103,30 @@ def window_material():
     return mat
 
 
+MATERIAL_BUILDERS = {
+    "wall": wall_material,
+    "floor": floor_material,
+    "door": door_material,
+    "window": window_material,
+}
+_materials = {}
+
+
+def get_material(kind):
+    """Shared material for ``kind``, built once per Blender process.
+
+    Every object of a kind uses the same datablock, so the glTF exporter
+    writes each material and texture only once per file. The fake user
+    keeps the library alive across clear_scene() between batch jobs.
+    """
+    mat = _materials.get(kind)
+    if mat is None or mat.name not in bpy.data.materials:
+        mat = MATERIAL_BUILDERS[kind]()
+        mat.use_fake_user = True
+        _materials[kind] = mat
+    return mat
+
+
 # -------------------------------------------------
 # GEOMETRY
 # -------------------------------------------------
@@ -113,10 +147,45 @@ def create_wall(vertices, img_w, img_h, scale, thickness, height, name):
 
     obj = bpy.data.objects.new(name, curve)
     bpy.context.collection.objects.link(obj)
-    obj.data.materials.append(wall_material())
+    obj.data.materials.append(get_material("wall"))
+    return obj
+
+
+def create_box_mesh(boxes, name):
+    """Link one mesh object built from several ``segment_box`` results."""
+    verts, faces = [], []
+    for box_verts, box_faces in boxes:
+        offset = len(verts)
+        verts.extend(box_verts)
+        faces.extend(tuple(i + offset for i in face) for face in box_faces)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], faces)
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(obj)
+    obj.data.materials.append(get_material("wall"))
     return obj
 
 
+def create_wall_segment(start, end, img_w, img_h, scale, thickness, height, name):
+    """Extrude a centerline wall segment as a plain 8-vertex box."""
+    return create_box_mesh(
+        [segment_box(start, end, img_w, img_h, scale, thickness, 0, height)], name
+    )
+
+
+def create_wall_pieces(pieces, img_w, img_h, scale):
+    """Extrude all cut wall pieces in one pass, one object per host wall."""
+    by_wall = {}
+    for p in pieces:
+        by_wall.setdefault(p["wall_id"], []).append(
+            segment_box(
+                p["start"], p["end"], img_w, img_h, scale, p["thickness"], p["z0"], p["z1"]
+            )
+        )
+    return [create_box_mesh(boxes, wall_id) for wall_id, boxes in by_wall.items()]
+
+
 def convert_to_mesh(obj):
     bpy.context.view_layer.objects.active = obj
     obj.select_set(True)
@@ -163,10 +232,45 @@ def create_floor(rooms, img_w, img_h, scale):
     bpy.ops.uv.unwrap()
     bpy.ops.object.mode_set(mode="OBJECT")
 
-    obj.data.materials.append(floor_material())
+    obj.data.materials.append(get_material("floor"))
     return obj
 
 
+def create_room_floors(rooms, img_w, img_h, scale):
+    """One floor mesh per segmented room, UV-mapped in plan space.
+
+    UVs span the whole plan, so the shared floor texture tiles seamlessly
+    across rooms without a per-room unwrap.
+    """
+    span = max(img_w, img_h) * scale
+    objs = []
+    for r in rooms:
+        verts = [
+            ((nx - 0.5) * img_w * scale, (0.5 - ny) * img_h * scale, 0)
+            for nx, ny in r["polygon"]
+        ]
+        # Counter-clockwise in plan so the face normal points up
+        signed_area = sum(
+            x0 * y1 - x1 * y0
+            for (x0, y0, _), (x1, y1, _) in zip(verts, verts[1:] + verts[:1])
+        )
+        if signed_area < 0:
+            verts.reverse()
+
+        mesh = bpy.data.meshes.new(f"{r['id']}_floor")
+        mesh.from_pydata(verts, [], [tuple(range(len(verts)))])
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        for loop in mesh.loops:
+            x, y, _ = verts[loop.vertex_index]
+            uv_layer.data[loop.index].uv = (x / span + 0.5, y / span + 0.5)
+
+        obj = bpy.data.objects.new(r["id"], mesh)
+        bpy.context.collection.objects.link(obj)
+        obj.data.materials.append(get_material("floor"))
+        objs.append(obj)
+    return objs
+
+
 # -------------------------------------------------
 # LIGHT + CAMERA
 # -------------------------------------------------
@@ -190,14 +294,7 @@ def add_camera(scale):
 # -------------------------------------------------
 # MAIN
 # -------------------------------------------------
-def main():
-    argv = sys.argv
-    argv = argv[argv.index("--") + 1 :]
-    analysis_file, output_path = argv
-
-    with open(analysis_file) as f:
-        data = json.load(f)
-
+def build_and_export(data, output_path):
     clear_scene()
 
     img_w = data["image_width"]
@@ -205,7 +302,26 @@ def main():
     scale = data["scale_factor"]
     wall_h = data["wall_height"]
 
+    # Segment walls with openings already cut in plan (see openings.py)
+    if data.get("wall_pieces"):
+        create_wall_pieces(data["wall_pieces"], img_w, img_h, scale)
+
     for w in data["walls"]:
+        if "start" in w and data.get("wall_pieces"):
+            continue
+        if "start" in w:
+            create_wall_segment(
+                w["start"],
+                w["end"],
+                img_w,
+                img_h,
+                scale,
+                w["thickness"],
+                wall_h,
+                w["id"],
+            )
+            continue
+
         obj = create_wall(
             w["vertices"],
             img_w,
@@ -227,7 +343,7 @@ def main():
             scale,
             0.15,
             d["id"],
-            door_material(),
+            get_material("door"),
         )
 
     for w in data["windows"]:
@@ -240,20 +356,22 @@ def main():
             scale,
             0.07,
             w["id"],
-            window_material(),
+            get_material("window"),
         )
 
-    if data["rooms"]:
+    if data["rooms"] and all("polygon" in r for r in data["rooms"]):
+        create_room_floors(data["rooms"], img_w, img_h, scale)
+    elif data["rooms"]:
         create_floor(data["rooms"], img_w, img_h, scale)
 
     add_lighting(max(img_w, img_h) * scale * 0.3)
     add_camera(max(img_w, img_h) * scale * 0.35)
 
-    bpy.ops.export_scene.gltf(
-        filepath=output_path,
-        export_format="GLB",
-        export_apply=True,
-    )
+    export_scene(output_path, data.get("export_formats", ["glb"]))
+
+
+def main():
+    run_jobs(read_jobs(sys.argv), build_and_export)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from openings import cut_openings
+from rooms import extract_rooms
+from wall_segments import extract_wall_segments
+
+# Hand-picked analysis parameters, used when no preset covers an image
+DEFAULT_PARAMS = {
+    "blur_size": 5,
+    "block_size": 15,
+    "threshold_c": 5,
+    "morph_kernel_size": 5,
+    "min_wall_area": 400,
+}
+PARAM_NAMES = tuple(DEFAULT_PARAMS)
+
+# Per-resolution presets written by tune_analysis.py
+PRESETS_PATH = os.environ.get(
+    "ANALYSIS_PRESETS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_presets.json"),
+)
+_presets = None
+
+
+# ---------- PRESETS ----------
+
+def load_presets(path=PRESETS_PATH):
+    """Presets sorted by ``max_side``; an empty list when none were tuned."""
+    global _presets
+    if _presets is None:
+        try:
+            with open(path) as f:
+                presets = json.load(f)["presets"]
+        except FileNotFoundError:
+            presets = []
+        except (ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring invalid analysis presets {path}: {e}")
+            presets = []
+        _presets = sorted(
+            presets,
+            key=lambda p: float("inf") if p["max_side"] is None else p["max_side"],
+        )
+    return _presets
+
+
+def preset_for(width, height):
+    """Return ``(name, params)`` for an image size.
+
+    The first preset whose ``max_side`` fits the image's longer side wins;
+    larger images than any preset use the largest one.
+    """
+    side = max(width, height)
+    presets = load_presets()
+    for preset in presets:
+        if preset["max_side"] is None or side <= preset["max_side"]:
+            break
+    else:
+        if not presets:
+            return "default", dict(DEFAULT_PARAMS)
+        preset = presets[-1]
+    return preset["name"], dict(DEFAULT_PARAMS, **preset["params"])
+
+
+# ---------- STAGES ----------
+
+def load_grayscale(image_path, image_bytes=None):
+    if image_bytes is not None:
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    else:
+        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError("Failed to load image for analysis.")
+    return img
+
+
+def threshold_image(img, blur_size, block_size, threshold_c):
+    blur = cv2.GaussianBlur(img, (blur_size, blur_size), 0)
+    return cv2.adaptiveThreshold(
+        blur,
+        255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY_INV,
+        block_size,
+        threshold_c,
+    )
+
+
+def close_open(thresh, morph_kernel_size):
+    kernel = np.ones((morph_kernel_size, morph_kernel_size), np.uint8)
+    morph = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+    return cv2.morphologyEx(morph, cv2.MORPH_OPEN, kernel, iterations=1)
+
+
+def find_contours(morph):
+    contours, hierarchy = cv2.findContours(
+        morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    return contours
+
+
+def build_analysis(
+    morph,
+    contours,
+    wall_height,
+    scale_factor,
+    min_wall_area,
+    wall_mode="contours",
+):
+    """Classify contours into walls/doors/windows and segment rooms."""
+    h, w = morph.shape[:2]
+
+    walls = []
+    doors = []
+    windows = []
+    all_wall_points = []
+    wall_contours = []
+    wall_area = 0.0
+    largest_wall_area = 0.0
+
+    def norm_pt(pt):
+        x, y = pt
+        return [float(x) / w, float(y) / h]
+
+    for i, cnt in enumerate(contours):
+        area = cv2.contourArea(cnt)
+        if area < min_wall_area:
+            continue
+
+        peri = cv2.arcLength(cnt, True)
+        eps = max(2.0, 0.01 * peri)
+        approx = cv2.approxPolyDP(cnt, eps, True)
+        pts = [tuple(p[0]) for p in approx]
+
+        x, y, w_rect, h_rect = cv2.boundingRect(approx)
+        rect_area = w_rect * h_rect
+
+        if (
+            len(pts) == 4
+            and rect_area < area * 0.6
+            and rect_area < 5000
+            and (min(w_rect, h_rect) < max(w_rect, h_rect) * 0.35)
+        ):
+            if max(w_rect, h_rect) / float(min(w_rect, h_rect) + 1e-6) > 1.5:
+                center = (x + w_rect / 2, y + h_rect / 2)
+                doors.append(
+                    {
+                        "id": f"door_{len(doors)}",
+                        "center": [center[0] / w, center[1] / h],
+                        "width": w_rect / float(w),
+                        "height": h_rect / float(h),
+                        "area_px": rect_area,
+                    }
+                )
+                continue
+            else:
+                center = (x + w_rect / 2, y + h_rect / 2)
+                windows.append(
+                    {
+                        "id": f"window_{len(windows)}",
+                        "center": [center[0] / w, center[1] / h],
+                        "width": w_rect / float(w),
+                        "height": h_rect / float(h),
+                        "area_px": rect_area,
+                    }
+                )
+                continue
+
+        norm_poly = [norm_pt(p) for p in pts]
+        walls.append(
+            {
+                "id": f"wall_{len(walls)}",
+                "vertices": norm_poly,
+                "thickness": 0.01,
+            }
+        )
+        all_wall_points.extend(pts)
+        wall_contours.append(cnt)
+        wall_area += area
+        largest_wall_area = max(largest_wall_area, area)
+
+    # Only the wall contours' own pixels: filling them and masking with the
+    # morph image keeps enclosed rooms, openings and small text out
+    wall_mask = np.zeros_like(morph)
+    cv2.drawContours(wall_mask, wall_contours, -1, 255, cv2.FILLED)
+    wall_mask = cv2.bitwise_and(wall_mask, morph)
+
+    if wall_mode == "segments":
+        walls = []
+        all_wall_points = []
+        for x1, y1, x2, y2, thickness in extract_wall_segments(wall_mask):
+            walls.append(
+                {
+                    "id": f"wall_{len(walls)}",
+                    "start": norm_pt((x1, y1)),
+                    "end": norm_pt((x2, y2)),
+                    # Full wall width, relative to image width
+                    "thickness": thickness / float(w),
+                }
+            )
+            all_wall_points.extend([(x1, y1), (x2, y2)])
+
+    rooms, room_index = extract_rooms(wall_mask, scale_factor)
+
+    if not rooms and len(all_wall_points) > 0:
+        # No enclosed room found: fall back to the plan's bounding box
+        all_pts_arr = np.array(all_wall_points)
+        min_x, min_y = np.min(all_pts_arr, axis=0)
+        max_x, max_y = np.max(all_pts_arr, axis=0)
+        room_bounds = {
+            "id": "room_0",
+            "bounds": {
+                "x": float(min_x) / w,
+                "y": float(min_y) / h,
+                "width": float(max_x - min_x) / w,
+                "height": float(max_y - min_y) / h,
+            },
+            "center": [
+                (min_x + max_x) / (2 * w),
+                (min_y + max_y) / (2 * h),
+            ],
+        }
+        rooms = [room_bounds]
+
+    analysis = {
+        "image_width": w,
+        "image_height": h,
+        "scale_factor": scale_factor,
+        "wall_height": wall_height,
+        "walls": walls,
+        "doors": doors,
+        "windows": windows,
+        "rooms": rooms,
+        "room_index": room_index,
+        "wall_mode": wall_mode,
+        # Contour statistics used by analysis_router to score confidence
+        "stats": {
+            "raw_contours": len(contours),
+            # Walls from the contour pass, independent of wall_mode
+            "wall_contours": len(wall_contours),
+            "wall_coverage": float(np.count_nonzero(morph)) / float(w * h),
+            "largest_wall_ratio": largest_wall_area / wall_area if wall_area else 0.0,
+        },
+    }
+
+    if wall_mode == "segments":
+        cut_openings(analysis)
+
+    return analysis, wall_mask
+
+
+# ---------- IMAGE ANALYSIS (OLD PIPELINE) ----------
+
+# def create_analysis_from_blueprint(
+#     image_path,
+#     wall_height=3.0,
+#     scale_factor=0.02,
+#     min_wall_area=400,
+#     morph_kernel_size=5,
+# ):
+def create_analysis_from_blueprint(
+    image_path,
+    wall_height=2.0,  # *** CHANGED: Reduced from 3.0 ***
+    scale_factor=0.015,  # *** CHANGED: Slightly larger for better proportions ***
+    min_wall_area=None,
+    morph_kernel_size=None,
+    wall_mode="contours",
+    image_bytes=None,
+    blur_size=None,
+    block_size=None,
+    threshold_c=None,
+):
+    """Analyze a raster floor plan.
+
+    Parameters left as None come from the preset matching the image's
+    resolution (see ``preset_for``), or from ``DEFAULT_PARAMS``.
+    """
+    print(f"🧾 Analyzing blueprint: {image_path}")
+    img = load_grayscale(image_path, image_bytes)
+    h, w = img.shape[:2]
+
+    preset, params = preset_for(w, h)
+    explicit = {
+        "blur_size": blur_size,
+        "block_size": block_size,
+        "threshold_c": threshold_c,
+        "morph_kernel_size": morph_kernel_size,
+        "min_wall_area": min_wall_area,
+    }
+    params.update({k: v for k, v in explicit.items() if v is not None})
+
+    thresh = threshold_image(
+        img, params["blur_size"], params["block_size"], params["threshold_c"]
+    )
+    morph = close_open(thresh, params["morph_kernel_size"])
+    contours = find_contours(morph)
+    print(f"🔎 Found {len(contours)} raw contours (preset: {preset})")
+
+    analysis, _ = build_analysis(
+        morph,
+        contours,
+        wall_height,
+        scale_factor,
+        params["min_wall_area"],
+        wall_mode,
+    )
+    analysis["analysis_params"] = dict(params, preset=preset)
+
+    print(
+        f"✅ Analysis: walls={len(analysis['walls'])}, "
+        f"doors={len(analysis['doors'])}, "
+        f"windows={len(analysis['windows'])}, rooms={len(analysis['rooms'])}"
+    )
+    return analysis
@@ -0,0 +1,229 @@
+import json
+import math
+import struct
+
+# Plain PBR stand-ins for the Blender materials in generate_model_image.py,
+# keyed by element kind: (base colour RGBA, metallic, roughness)
+MATERIALS = {
+    "wall": ((0.88, 0.88, 0.88, 1.0), 0.0, 0.75),
+    "door": ((0.55, 0.32, 0.15, 1.0), 0.0, 0.5),
+    "window": ((0.7, 0.85, 1.0, 0.3), 0.0, 0.05),
+}
+DOOR_DEPTH = 0.15
+WINDOW_DEPTH = 0.07
+
+BOX_FACES = [
+    (3, 2, 1, 0),
+    (4, 5, 6, 7),
+    (0, 1, 5, 4),
+    (1, 2, 6, 5),
+    (2, 3, 7, 6),
+    (3, 0, 4, 7),
+]
+
+
+# ---------- PLAN GEOMETRY ----------
+
+def segment_box(start, end, img_w, img_h, scale, thickness, z0, z1):
+    """Vertices and faces of a box swept along a plan segment from z0 to z1."""
+    x1 = (start[0] - 0.5) * img_w * scale
+    y1 = (0.5 - start[1]) * img_h * scale
+    x2 = (end[0] - 0.5) * img_w * scale
+    y2 = (0.5 - end[1]) * img_h * scale
+
+    length = math.hypot(x2 - x1, y2 - y1) or 1e-6
+    half = thickness * img_w * scale / 2
+    nx, ny = -(y2 - y1) / length * half, (x2 - x1) / length * half
+
+    base = [
+        (x1 + nx, y1 + ny),
+        (x2 + nx, y2 + ny),
+        (x2 - nx, y2 - ny),
+        (x1 - nx, y1 - ny),
+    ]
+    verts = [(x, y, z0) for x, y in base] + [(x, y, z1) for x, y in base]
+    return verts, BOX_FACES
+
+
+def opening_box(center, width, height, img_w, img_h, scale, depth):
+    """Axis-aligned door/window box, matching create_box in Blender."""
+    cx = (center[0] - 0.5) * img_w * scale
+    cy = (0.5 - center[1]) * img_h * scale
+    hx = width * img_w * scale / 2
+    hy = height * img_h * scale / 2
+    base = [(cx - hx, cy - hy), (cx + hx, cy - hy), (cx + hx, cy + hy), (cx - hx, cy + hy)]
+    verts = [(x, y, 0.0) for x, y in base] + [(x, y, depth) for x, y in base]
+    return verts, BOX_FACES
+
+
+def element_boxes(analysis, kind, element):
+    """Boxes for one wall, door or window of an image analysis.
+
+    Segment walls use their cut ``wall_pieces`` when present. Polygon walls
+    are approximated by one box per contour edge with the bevel width and
+    symmetric extrusion of the curve Blender builds for them.
+    """
+    img_w = analysis["image_width"]
+    img_h = analysis["image_height"]
+    scale = analysis["scale_factor"]
+    wall_h = analysis["wall_height"]
+
+    if kind == "door" or kind == "window":
+        depth = DOOR_DEPTH if kind == "door" else WINDOW_DEPTH
+        return [
+            opening_box(
+                element["center"],
+                element["width"],
+                element["height"],
+                img_w,
+                img_h,
+                scale,
+                depth,
+            )
+        ]
+
+    if "start" in element:
+        pieces = [
+            p for p in analysis.get("wall_pieces", []) if p["wall_id"] == element["id"]
+        ]
+        if not pieces:
+            pieces = [dict(element, z0=0.0, z1=wall_h)]
+        return [
+            segment_box(
+                p["start"], p["end"], img_w, img_h, scale, p["thickness"], p["z0"], p["z1"]
+            )
+            for p in pieces
+        ]
+
+    vertices = element["vertices"]
+    return [
+        segment_box(a, b, img_w, img_h, scale, element["thickness"] * 2, -wall_h, wall_h)
+        for a, b in zip(vertices, vertices[1:] + vertices[:1])
+    ]
+
+
+# ---------- GLB WRITER ----------
+
+def _triangles(verts, faces):
+    """Flat-shaded, unindexed triangles in glTF's Y-up frame."""
+    positions, normals = [], []
+    for face in faces:
+        for i in range(1, len(face) - 1):
+            tri = [verts[face[0]], verts[face[i]], verts[face[i + 1]]]
+            (ax, ay, az), (bx, by, bz), (cx, cy, cz) = tri
+            ux, uy, uz = bx - ax, by - ay, bz - az
+            vx, vy, vz = cx - ax, cy - ay, cz - az
+            nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+            length = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.0
+            for x, y, z in tri:
+                # Blender is Z-up; glTF is Y-up with -Y forward
+                positions.append((x, z, -y))
+                normals.append((nx / length, nz / length, -ny / length))
+    return positions, normals
+
+
+def write_glb(path, nodes):
+    """Write ``[(name, kind, boxes)]`` as a binary glTF file.
+
+    Each entry becomes one named node with its own mesh, so a viewer can
+    swap it for the node of the same name in the full model. Entries with
+    no boxes become empty nodes, marking removed elements.
+    """
+    binary = bytearray()
+    gltf = {
+        "asset": {"version": "2.0", "generator": "PlanVista3D delta"},
+        "scene": 0,
+        "scenes": [{"nodes": list(range(len(nodes)))}],
+        "nodes": [],
+        "meshes": [],
+        "materials": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": [],
+    }
+    material_index = {}
+
+    def add_view(data, count, kind, bounds=None):
+        gltf["bufferViews"].append(
+            {"buffer": 0, "byteOffset": len(binary), "byteLength": len(data), "target": 34962}
+        )
+        binary.extend(data)
+        accessor = {
+            "bufferView": len(gltf["bufferViews"]) - 1,
+            "componentType": 5126,
+            "count": count,
+            "type": kind,
+        }
+        if bounds:
+            accessor["min"], accessor["max"] = bounds
+        gltf["accessors"].append(accessor)
+        return len(gltf["accessors"]) - 1
+
+    for name, kind, boxes in nodes:
+        node = {"name": name}
+        positions, normals = [], []
+        for verts, faces in boxes:
+            p, n = _triangles(verts, faces)
+            positions.extend(p)
+            normals.extend(n)
+
+        if positions:
+            if kind not in material_index:
+                color, metallic, roughness = MATERIALS[kind]
+                material = {
+                    "name": f"{kind.capitalize()}Material",
+                    "pbrMetallicRoughness": {
+                        "baseColorFactor": list(color),
+                        "metallicFactor": metallic,
+                        "roughnessFactor": roughness,
+                    },
+                }
+                if color[3] < 1.0:
+                    material["alphaMode"] = "BLEND"
+                material_index[kind] = len(gltf["materials"])
+                gltf["materials"].append(material)
+
+            bounds = (
+                [min(c[i] for c in positions) for i in range(3)],
+                [max(c[i] for c in positions) for i in range(3)],
+            )
+            flat = [c for xyz in positions for c in xyz]
+            position = add_view(
+                struct.pack(f"<{len(flat)}f", *flat), len(positions), "VEC3", bounds
+            )
+            flat = [c for xyz in normals for c in xyz]
+            normal = add_view(struct.pack(f"<{len(flat)}f", *flat), len(normals), "VEC3")
+            node["mesh"] = len(gltf["meshes"])
+            gltf["meshes"].append(
+                {
+                    "name": name,
+                    "primitives": [
+                        {
+                            "attributes": {"POSITION": position, "NORMAL": normal},
+                            "material": material_index[kind],
+                        }
+                    ],
+                }
+            )
+        gltf["nodes"].append(node)
+
+    gltf["buffers"].append({"byteLength": len(binary)})
+    for key in ("meshes", "materials", "accessors", "bufferViews"):
+        if not gltf[key]:
+            del gltf[key]
+    if not binary:
+        del gltf["buffers"]
+
+    json_chunk = json.dumps(gltf, separators=(",", ":")).encode()
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = bytes(binary) + b"\0" * (-len(binary) % 4)
+
+    length = 12 + 8 + len(json_chunk) + (8 + len(bin_chunk) if bin_chunk else 0)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, length))
+        f.write(struct.pack("<I4s", len(json_chunk), b"JSON"))
+        f.write(json_chunk)
+        if bin_chunk:
+            f.write(struct.pack("<I4s", len(bin_chunk), b"BIN\0"))
+            f.write(bin_chunk)
+    return path
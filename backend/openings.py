@@ -0,0 +1,158 @@
+import math
+from collections import defaultdict
+
+# Opening heights in metres, clamped to the wall height
+DOOR_HEAD = 2.1
+WINDOW_SILL = 0.9
+WINDOW_HEAD = 2.1
+
+GRID_CELL = 64.0  # pixels
+# How far (in px, beyond half the wall thickness) an opening may sit off its wall
+SNAP_TOLERANCE = 12.0
+
+
+# ---------- SPATIAL GRID ----------
+
+class SegmentGrid:
+    """Uniform grid over wall segments for constant-time neighbour lookups."""
+
+    def __init__(self, segments, cell=GRID_CELL):
+        self.cell = cell
+        self.cells = defaultdict(list)
+        for index, (x1, y1, x2, y2, thickness) in enumerate(segments):
+            pad = thickness / 2 + SNAP_TOLERANCE
+            for cx in range(
+                int((min(x1, x2) - pad) // cell), int((max(x1, x2) + pad) // cell) + 1
+            ):
+                for cy in range(
+                    int((min(y1, y2) - pad) // cell),
+                    int((max(y1, y2) + pad) // cell) + 1,
+                ):
+                    self.cells[(cx, cy)].append(index)
+
+    def near(self, x, y):
+        return self.cells.get((int(x // self.cell), int(y // self.cell)), [])
+
+
+# ---------- SPAN ARITHMETIC ----------
+
+def _merge_spans(spans):
+    merged = []
+    for t0, t1 in sorted(spans):
+        if merged and t0 <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], t1)
+        else:
+            merged.append([t0, t1])
+    return merged
+
+
+def _subtract_spans(length, spans):
+    solid = []
+    cursor = 0.0
+    for t0, t1 in spans:
+        if t0 > cursor:
+            solid.append((cursor, t0))
+        cursor = max(cursor, t1)
+    if cursor < length:
+        solid.append((cursor, length))
+    return solid
+
+
+# ---------- OPENINGS ----------
+
+def cut_openings(analysis):
+    """Cut doors and windows out of segment walls in plan.
+
+    Each opening is snapped to the nearest wall segment through a grid
+    index, and its footprint along that wall is removed from the segment.
+    The result is stored as ``analysis["wall_pieces"]``: full-height solid
+    pieces plus lintels (and sills for windows) spanning the openings, each
+    with ``z0``/``z1`` in metres, ready to be extruded in one pass. Openings
+    get a ``host_wall`` id when they were snapped. Polygon walls are left
+    untouched.
+    """
+    w = float(analysis["image_width"])
+    h = float(analysis["image_height"])
+    wall_height = float(analysis["wall_height"])
+
+    walls = [wall for wall in analysis["walls"] if "start" in wall]
+    segments = [
+        (
+            wall["start"][0] * w,
+            wall["start"][1] * h,
+            wall["end"][0] * w,
+            wall["end"][1] * h,
+            wall["thickness"] * w,
+        )
+        for wall in walls
+    ]
+    grid = SegmentGrid(segments)
+
+    door_head = min(DOOR_HEAD, wall_height * 0.85)
+    window_sill = min(WINDOW_SILL, wall_height * 0.35)
+    window_head = min(WINDOW_HEAD, wall_height * 0.85)
+
+    cuts = defaultdict(list)  # wall index -> [(t0, t1, kind)]
+    for kind, items in (("door", analysis["doors"]), ("window", analysis["windows"])):
+        for opening in items:
+            ox, oy = opening["center"][0] * w, opening["center"][1] * h
+            ow, oh = opening["width"] * w, opening["height"] * h
+
+            best = None
+            for index in grid.near(ox, oy):
+                x1, y1, x2, y2, thickness = segments[index]
+                length = math.hypot(x2 - x1, y2 - y1)
+                if length < 1e-6:
+                    continue
+                dx, dy = (x2 - x1) / length, (y2 - y1) / length
+                t = (ox - x1) * dx + (oy - y1) * dy
+                if t < 0 or t > length:
+                    continue
+                dist = abs((ox - x1) * -dy + (oy - y1) * dx)
+                if dist > thickness / 2 + SNAP_TOLERANCE:
+                    continue
+                if best is None or dist < best[0]:
+                    # Footprint of the opening's box measured along the wall
+                    half = (abs(dx) * ow + abs(dy) * oh) / 2
+                    best = (dist, index, max(0.0, t - half), min(length, t + half))
+
+            opening.pop("host_wall", None)
+            if best is None:
+                continue
+            _, index, t0, t1 = best
+            opening["host_wall"] = walls[index]["id"]
+            cuts[index].append((t0, t1, kind))
+
+    pieces = []
+
+    def add_piece(index, t0, t1, z0, z1):
+        x1, y1, x2, y2, thickness = segments[index]
+        length = math.hypot(x2 - x1, y2 - y1)
+        f0, f1 = t0 / length, t1 / length
+        pieces.append(
+            {
+                "id": f"{walls[index]['id']}_{len(pieces)}",
+                "wall_id": walls[index]["id"],
+                "start": [(x1 + (x2 - x1) * f0) / w, (y1 + (y2 - y1) * f0) / h],
+                "end": [(x1 + (x2 - x1) * f1) / w, (y1 + (y2 - y1) * f1) / h],
+                "thickness": walls[index]["thickness"],
+                "z0": z0,
+                "z1": z1,
+            }
+        )
+
+    for index, (x1, y1, x2, y2, _) in enumerate(segments):
+        length = math.hypot(x2 - x1, y2 - y1)
+        openings = cuts.get(index, [])
+        spans = _merge_spans([(t0, t1) for t0, t1, _ in openings])
+        for t0, t1 in _subtract_spans(length, spans):
+            add_piece(index, t0, t1, 0.0, wall_height)
+
+        for t0, t1, kind in openings:
+            head = door_head if kind == "door" else window_head
+            add_piece(index, t0, t1, head, wall_height)
+            if kind == "window":
+                add_piece(index, t0, t1, 0.0, window_sill)
+
+    analysis["wall_pieces"] = pieces
+    return analysis
@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+
+PREVIEW_SIZE = 256
+PADDING = 8
+
+# BGR for OpenCV, mirrored as hex for SVG
+COLORS = {
+    "background": (255, 255, 255),
+    "room": (235, 242, 247),
+    "wall": (40, 40, 40),
+    "door": (38, 82, 139),
+    "window": (235, 206, 135),
+}
+
+
+def _hex(bgr):
+    b, g, r = bgr
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# ---------- PRIMITIVES ----------
+
+def analysis_primitives(analysis):
+    """Collect drawable shapes from an image analysis in normalized coordinates."""
+    rooms = []
+    for r in analysis["rooms"]:
+        if "polygon" in r:
+            rooms.append(r["polygon"])
+            continue
+        b = r["bounds"]
+        rooms.append(
+            [
+                [b["x"], b["y"]],
+                [b["x"] + b["width"], b["y"]],
+                [b["x"] + b["width"], b["y"] + b["height"]],
+                [b["x"], b["y"] + b["height"]],
+            ]
+        )
+
+    rects = []
+    for kind, items in (("door", analysis["doors"]), ("window", analysis["windows"])):
+        for o in items:
+            cx, cy = o["center"]
+            rects.append(
+                (
+                    kind,
+                    [cx - o["width"] / 2, cy - o["height"] / 2],
+                    [cx + o["width"] / 2, cy + o["height"] / 2],
+                )
+            )
+
+    return {
+        "aspect": analysis["image_width"] / float(analysis["image_height"]),
+        "rooms": rooms,
+        "walls": [
+            ([w["start"], w["end"]], False) if "start" in w else (w["vertices"], True)
+            for w in analysis["walls"]
+        ],
+        "rects": rects,
+    }
+
+
+def dxf_primitives(dxf_path):
+    """Collect LINE segments from a DXF, normalized to its bounding box."""
+    import ezdxf
+
+    msp = ezdxf.readfile(dxf_path).modelspace()
+    segments = np.array(
+        [
+            (e.dxf.start.x, e.dxf.start.y, e.dxf.end.x, e.dxf.end.y)
+            for e in msp.query("LINE")
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 2, 2)
+    if len(segments) == 0:
+        raise RuntimeError("No usable LINE entities for walls in DXF")
+
+    pts = segments.reshape(-1, 2)
+    mins = pts.min(axis=0)
+    extent = np.maximum(pts.max(axis=0) - mins, 1e-9)
+    norm = (segments - mins) / extent
+    # DXF y grows upwards, image y grows downwards
+    norm[..., 1] = 1.0 - norm[..., 1]
+
+    return {
+        "aspect": float(extent[0] / extent[1]),
+        "rooms": [],
+        "walls": [(seg.tolist(), False) for seg in norm],
+        "rects": [],
+    }
+
+
+# ---------- RENDERING ----------
+
+def _canvas_size(aspect, size):
+    if aspect >= 1:
+        return size, max(1, int(round(size / aspect)))
+    return max(1, int(round(size * aspect))), size
+
+
+def _to_px(points, width, height):
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    pts = pts * [width - 2 * PADDING, height - 2 * PADDING] + PADDING
+    return np.round(pts).astype(np.int32)
+
+
+def render_png(prims, size=PREVIEW_SIZE):
+    width, height = _canvas_size(prims["aspect"], size)
+    img = np.full((height, width, 3), COLORS["background"], np.uint8)
+
+    if prims["rooms"]:
+        cv2.fillPoly(
+            img, [_to_px(r, width, height) for r in prims["rooms"]], COLORS["room"]
+        )
+
+    closed = [_to_px(p, width, height) for p, is_closed in prims["walls"] if is_closed]
+    open_ = [_to_px(p, width, height) for p, is_closed in prims["walls"] if not is_closed]
+    if closed:
+        cv2.polylines(img, closed, True, COLORS["wall"], 1, cv2.LINE_AA)
+    if open_:
+        cv2.polylines(img, open_, False, COLORS["wall"], 1, cv2.LINE_AA)
+
+    for kind, p0, p1 in prims["rects"]:
+        (x0, y0), (x1, y1) = _to_px([p0, p1], width, height)
+        cv2.rectangle(img, (x0, y0), (x1, y1), COLORS[kind], -1)
+
+    ok, buf = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if not ok:
+        raise RuntimeError("Failed to encode preview PNG")
+    return buf.tobytes()
+
+
+def render_svg(prims, size=PREVIEW_SIZE):
+    width, height = _canvas_size(prims["aspect"], size)
+
+    def pts_attr(points):
+        return " ".join(f"{x},{y}" for x, y in _to_px(points, width, height))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">',
+        f'<rect width="100%" height="100%" fill="{_hex(COLORS["background"])}"/>',
+    ]
+    for r in prims["rooms"]:
+        parts.append(
+            f'<polygon points="{pts_attr(r)}" fill="{_hex(COLORS["room"])}"/>'
+        )
+    for points, is_closed in prims["walls"]:
+        tag = "polygon" if is_closed else "polyline"
+        parts.append(
+            f'<{tag} points="{pts_attr(points)}" fill="none" '
+            f'stroke="{_hex(COLORS["wall"])}" stroke-width="1"/>'
+        )
+    for kind, p0, p1 in prims["rects"]:
+        (x0, y0), (x1, y1) = _to_px([p0, p1], width, height)
+        parts.append(
+            f'<rect x="{x0}" y="{y0}" width="{max(1, x1 - x0)}" '
+            f'height="{max(1, y1 - y0)}" fill="{_hex(COLORS[kind])}"/>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def write_previews(prims, base_path, size=PREVIEW_SIZE):
+    """Write ``<base_path>.png`` and ``<base_path>.svg``; returns both paths."""
+    png_path = base_path + ".png"
+    svg_path = base_path + ".svg"
+    with open(png_path, "wb") as f:
+        f.write(render_png(prims, size))
+    with open(svg_path, "w") as f:
+        f.write(render_svg(prims, size))
+    return png_path, svg_path
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+
+# Rooms smaller than this share of the image are treated as noise
+MIN_ROOM_AREA_RATIO = 0.002
+# Door gaps up to this share of the larger image side are closed first
+GAP_CLOSE_RATIO = 0.065
+# Components with more of their bounding-box perimeter than this on the
+# footprint hull are exterior pockets, not rooms
+MAX_HULL_CONTACT = 0.5
+# Side of the coarse label grid used for picking
+ROOM_INDEX_SIZE = 64
+
+
+def extract_rooms(wall_mask, scale_factor):
+    """Segment rooms from a binary wall mask in one connected-component pass.
+
+    The free space inside the building footprint (inverted wall mask, with
+    door-sized gaps closed) is labelled once with
+    ``connectedComponentsWithStats``; pockets lying along the footprint hull
+    are exterior and dropped. Returns
+    ``(rooms, room_index)`` where each room has a simplified ``polygon``,
+    ``area_px``/``area_m2`` and ``centroid`` in normalized coordinates, and
+    ``room_index`` is a coarse label grid (0 = no room, n = ``rooms[n-1]``)
+    for constant-time picking.
+    """
+    h, w = wall_mask.shape[:2]
+    size = max(w, h)
+
+    # Building footprint: convex hull of all wall pixels. Rooms behind wide
+    # openings (garage doors, window bands) are bounded by the hull edge.
+    points = cv2.findNonZero(wall_mask)
+    footprint = np.zeros_like(wall_mask)
+    if points is None:
+        return [], {"cols": 0, "rows": 0, "cells": []}
+    cv2.fillConvexPoly(footprint, cv2.convexHull(points), 255)
+    # Thin band just outside the hull, used to measure exterior contact
+    band = cv2.dilate(footprint, np.ones((5, 5), np.uint8)) & ~footprint
+    band = cv2.dilate(band, np.ones((5, 5), np.uint8))
+
+    gap = max(3, int(GAP_CLOSE_RATIO * size))
+    closed = cv2.morphologyEx(
+        wall_mask, cv2.MORPH_CLOSE, np.ones((gap, gap), np.uint8)
+    )
+    free = cv2.bitwise_and(cv2.bitwise_not(closed), footprint)
+
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        free, connectivity=4
+    )
+
+    x0 = stats[:, cv2.CC_STAT_LEFT]
+    y0 = stats[:, cv2.CC_STAT_TOP]
+    x1 = x0 + stats[:, cv2.CC_STAT_WIDTH]
+    y1 = y0 + stats[:, cv2.CC_STAT_HEIGHT]
+    areas = stats[:, cv2.CC_STAT_AREA]
+    interior = (x0 > 0) & (y0 > 0) & (x1 < w) & (y1 < h)
+    # Pockets between the hull and a concave outline touch the hull along
+    # much of their boundary; real rooms only along an opening.
+    contact = np.bincount(labels[band > 0], minlength=count)
+    box_perimeter = 2 * (stats[:, cv2.CC_STAT_WIDTH] + stats[:, cv2.CC_STAT_HEIGHT])
+    exterior = contact / np.maximum(box_perimeter, 1) > MAX_HULL_CONTACT
+    keep = interior & ~exterior & (areas >= MIN_ROOM_AREA_RATIO * w * h)
+    keep[0] = False  # label 0 is the wall mask itself
+
+    rooms = []
+    remap = np.zeros(count, np.int32)
+    for label in np.flatnonzero(keep):
+        crop = (labels[y0[label] : y1[label], x0[label] : x1[label]] == label).astype(
+            np.uint8
+        )
+        contours, _ = cv2.findContours(crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        outline = max(contours, key=cv2.contourArea)
+        approx = cv2.approxPolyDP(outline, 0.01 * cv2.arcLength(outline, True), True)
+        if len(approx) < 3:
+            continue
+
+        poly = approx.reshape(-1, 2) + [x0[label], y0[label]]
+        cx, cy = centroids[label]
+        rooms.append(
+            {
+                "id": f"room_{len(rooms)}",
+                "polygon": [[float(x) / w, float(y) / h] for x, y in poly],
+                "area_px": int(areas[label]),
+                "area_m2": round(float(areas[label]) * scale_factor**2, 2),
+                "centroid": [float(cx) / w, float(cy) / h],
+                "center": [float(cx) / w, float(cy) / h],
+                "bounds": {
+                    "x": float(x0[label]) / w,
+                    "y": float(y0[label]) / h,
+                    "width": float(x1[label] - x0[label]) / w,
+                    "height": float(y1[label] - y0[label]) / h,
+                },
+            }
+        )
+        remap[label] = len(rooms)
+
+    grid = cv2.resize(
+        remap[labels], (ROOM_INDEX_SIZE, ROOM_INDEX_SIZE), interpolation=cv2.INTER_NEAREST
+    )
+    room_index = {
+        "cols": ROOM_INDEX_SIZE,
+        "rows": ROOM_INDEX_SIZE,
+        "cells": grid.tolist(),
+    }
+    return rooms, room_index
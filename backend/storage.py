@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import time
+
+# Every stored file name starts with the task (or batch) uuid it belongs to
+KEY_LENGTH = 36
+
+HOUR = 3600.0
+
+# Artifact type -> retention in seconds since the owning task was last used
+RETENTION = {
+    "upload": float(os.environ.get("RETAIN_UPLOAD_HOURS", 24)) * HOUR,
+    "analysis": float(os.environ.get("RETAIN_ANALYSIS_HOURS", 24 * 7)) * HOUR,
+    "model": float(os.environ.get("RETAIN_MODEL_HOURS", 24 * 7)) * HOUR,
+    "preview": float(os.environ.get("RETAIN_PREVIEW_HOURS", 24 * 7)) * HOUR,
+    "delta": float(os.environ.get("RETAIN_DELTA_HOURS", 24)) * HOUR,
+}
+STORAGE_QUOTA_MB = int(os.environ.get("STORAGE_QUOTA_MB", 10 * 1024))
+SWEEP_INTERVAL_SEC = int(os.environ.get("STORAGE_SWEEP_SEC", 600))
+
+
+# ---------- SHARDED PATHS ----------
+
+def shard_key(filename):
+    return filename[:KEY_LENGTH]
+
+
+def shard_dir(root, key):
+    """Two-level hash shard (``root/ab/cd``) for everything under ``key``."""
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(root, digest[:2], digest[2:4])
+
+
+def stored_path(root, filename):
+    """Where ``filename`` lives under ``root``; creates its shard directory."""
+    directory = shard_dir(root, shard_key(filename))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def locate(root, filename):
+    """Existing path of ``filename`` under ``root``, or None.
+
+    Files written before sharding was introduced are still found at the
+    top level of ``root``.
+    """
+    for path in (
+        os.path.join(shard_dir(root, shard_key(filename)), filename),
+        os.path.join(root, filename),
+    ):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def artifact_type(root_kind, filename):
+    if filename.endswith(("_analysis.json", "_dxf_config.json", "_batch.json")):
+        return "analysis"
+    if "_preview." in filename:
+        return "preview"
+    if "_delta_" in filename:
+        return "delta"
+    return "upload" if root_kind == "upload" else "model"
+
+
+# ---------- LIFECYCLE ----------
+
+class StorageManager:
+    """Background retention and quota enforcement for stored artifacts.
+
+    Files expire per artifact type once their task has been idle longer
+    than its retention. If the total size is still over quota, whole tasks
+    are evicted least-recently-used first. Tasks for which ``is_pinned``
+    returns True (queued or running work) are never touched, and
+    ``on_evict`` is called with each task key once none of its files are
+    left.
+    """
+
+    def __init__(
+        self,
+        roots,
+        retention=None,
+        quota_mb=STORAGE_QUOTA_MB,
+        interval=SWEEP_INTERVAL_SEC,
+        is_pinned=None,
+        on_evict=None,
+    ):
+        self.roots = roots  # {"upload": "uploads", "output": "outputs"}
+        self.retention = retention or RETENTION
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.interval = interval
+        self.is_pinned = is_pinned or (lambda key: False)
+        self.on_evict = on_evict or (lambda key: None)
+        self.last_used = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def touch(self, key):
+        """Record that a task's files were just used."""
+        self.last_used[key] = time.time()
+
+    def scan(self):
+        """Return ``{key: [(path, type, size, mtime), ...]}`` for all roots."""
+        tasks = {}
+        for root_kind, root in self.roots.items():
+            for directory, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    tasks.setdefault(shard_key(filename), []).append(
+                        (
+                            path,
+                            artifact_type(root_kind, filename),
+                            st.st_size,
+                            st.st_mtime,
+                        )
+                    )
+        return tasks
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def sweep(self):
+        """Apply retention, then the quota. Returns ``(files, bytes)`` removed."""
+        with self.lock:
+            now = time.time()
+            removed_files = removed_bytes = 0
+            evicted = set()
+            usage = []  # (last used, key, files) of surviving tasks
+            total = 0
+
+            for key, files in self.scan().items():
+                if self.is_pinned(key):
+                    total += sum(size for _, _, size, _ in files)
+                    continue
+                last_used = max(
+                    self.last_used.get(key, 0.0), max(m for _, _, _, m in files)
+                )
+                kept = []
+                for path, kind, size, _ in files:
+                    if now - last_used > self.retention.get(kind, float("inf")):
+                        if self._remove(path):
+                            removed_files += 1
+                            removed_bytes += size
+                    else:
+                        kept.append((path, kind, size))
+                if not kept:
+                    evicted.add(key)
+                else:
+                    total += sum(size for _, _, size in kept)
+                    usage.append((last_used, key, kept))
+
+            # Least recently used tasks go first until we are back under quota
+            for _, key, kept in sorted(usage):
+                if total <= self.quota_bytes:
+                    break
+                for path, _, size in kept:
+                    if self._remove(path):
+                        removed_files += 1
+                        removed_bytes += size
+                    total -= size
+                evicted.add(key)
+
+            for key in evicted:
+                self.last_used.pop(key, None)
+                self.on_evict(key)
+
+        if removed_files:
+            print(
+                f"🧹 Storage sweep: removed {removed_files} files "
+                f"({removed_bytes / 1024 / 1024:.1f} MB), "
+                f"{total / 1024 / 1024:.1f} MB in use"
+            )
+        return removed_files, removed_bytes
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️ Storage sweep failed: {e}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
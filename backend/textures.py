@@ -0,0 +1,65 @@
+import os
+
+TEXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "textures")
+BUILD_DIR = os.path.join(TEXTURE_DIR, "build")
+
+MAX_TEXTURE_SIZE = int(os.environ.get("MAX_TEXTURE_SIZE", 1024))
+WEBP_QUALITY = 85
+
+
+def _floor_pow2(n):
+    return 1 << (max(1, int(n)).bit_length() - 1)
+
+
+def built_texture_name(name):
+    return os.path.splitext(name)[0] + ".webp"
+
+
+def texture_path(name):
+    """Path of the pre-processed texture for ``name``, or the source file.
+
+    Safe to import from Blender: it only touches the filesystem.
+    """
+    built = os.path.join(BUILD_DIR, built_texture_name(name))
+    if os.path.exists(built):
+        return built
+    return os.path.join(TEXTURE_DIR, name)
+
+
+def prepare_textures(max_size=MAX_TEXTURE_SIZE):
+    """Resize source textures to power-of-two WebP files in ``textures/build``.
+
+    Power-of-two sizes let WebGL generate mipmaps for tiled textures, and
+    WebP keeps each embedded copy small. Textures that are already up to
+    date are skipped, so this is cheap to call at every startup.
+    """
+    from PIL import Image
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    built = []
+    for name in sorted(os.listdir(TEXTURE_DIR)):
+        src = os.path.join(TEXTURE_DIR, name)
+        if not os.path.isfile(src) or not name.lower().endswith(
+            (".jpg", ".jpeg", ".png")
+        ):
+            continue
+
+        dst = os.path.join(BUILD_DIR, built_texture_name(name))
+        if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            built.append(dst)
+            continue
+
+        with Image.open(src) as img:
+            w, h = img.size
+            scale = min(1.0, max_size / float(max(w, h)))
+            size = (_floor_pow2(w * scale), _floor_pow2(h * scale))
+            img.convert("RGB").resize(size, Image.LANCZOS).save(
+                dst, "WEBP", quality=WEBP_QUALITY, method=6
+            )
+
+        print(
+            f"🧱 Texture {name}: {w}x{h} → {size[0]}x{size[1]} WebP "
+            f"({os.path.getsize(src)} → {os.path.getsize(dst)} bytes)"
+        )
+        built.append(dst)
+    return built
@@ -0,0 +1,297 @@
+"""Sweep image-analysis parameters over a plan corpus and emit presets.
+
+Every image is analyzed with every combination in GRID. The loops are
+nested by stage, so each blur/threshold, morphology and contour result is
+computed once and shared by the combinations that only differ in later
+parameters, while only the current one is kept in memory. The best
+combination per resolution bucket is written to analysis_presets.json,
+which image_analysis.preset_for() picks up on the next server start.
+
+A bucket is ranked on agreement with reference annotations when all of
+its images have them, otherwise on analysis_router's confidence score.
+An annotation is ``<annotations>/<image stem>.json`` with any of
+``walls``, ``doors``, ``windows`` and ``rooms`` counts, optionally next
+to a ``<image stem>_walls.png`` wall mask.
+
+    python tune_analysis.py ["../Blueprint Img"] --workers 8
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from analysis_router import score_confidence
+from image_analysis import (
+    DEFAULT_PARAMS,
+    PARAM_NAMES,
+    PRESETS_PATH,
+    build_analysis,
+    close_open,
+    find_contours,
+    load_grayscale,
+    threshold_image,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, "..", "Blueprint Img")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+GRID = {
+    "blur_size": [3, 5, 7],
+    "block_size": [11, 15, 25, 35],
+    "threshold_c": [3, 5, 8],
+    "morph_kernel_size": [3, 5, 7],
+    "min_wall_area": [200, 400, 800],
+}
+
+# (name, longest image side in px); None covers everything larger
+RESOLUTION_BUCKETS = [("small", 1024), ("medium", 2048), ("large", None)]
+
+# Quality differences below this are ties, broken by runtime
+QUALITY_TOLERANCE = 0.01
+
+WALL_HEIGHT = 2.5
+SCALE_FACTOR = 0.015
+
+
+# ---------- ANNOTATIONS ----------
+
+def load_annotation(annotations_dir, image_path):
+    if not annotations_dir:
+        return None
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    annotation = {}
+    counts_path = os.path.join(annotations_dir, stem + ".json")
+    if os.path.exists(counts_path):
+        with open(counts_path) as f:
+            annotation["counts"] = json.load(f)
+    mask_path = os.path.join(annotations_dir, stem + "_walls.png")
+    if os.path.exists(mask_path):
+        annotation["mask_path"] = mask_path
+    return annotation or None
+
+
+def agreement(analysis, wall_mask, annotation, reference_mask):
+    """Mean of count agreement and wall-mask IoU, each from 0.0 to 1.0."""
+    scores = []
+    for key, expected in annotation.get("counts", {}).items():
+        if key in ("walls", "doors", "windows", "rooms"):
+            found = len(analysis[key])
+            scores.append(1.0 - min(1.0, abs(found - expected) / max(expected, 1)))
+    if reference_mask is not None:
+        union = cv2.countNonZero(cv2.bitwise_or(wall_mask, reference_mask))
+        inter = cv2.countNonZero(cv2.bitwise_and(wall_mask, reference_mask))
+        scores.append(inter / union if union else 1.0)
+    return sum(scores) / len(scores) if scores else None
+
+
+# ---------- SWEEP ----------
+
+def bucket_for(width, height):
+    side = max(width, height)
+    for name, max_side in RESOLUTION_BUCKETS:
+        if max_side is None or side <= max_side:
+            return name
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def sweep_image(image_path, grid, wall_mode, annotation):
+    """Analyze one image with every grid combination; returns result rows."""
+    img = load_grayscale(image_path)
+    h, w = img.shape[:2]
+
+    reference_mask = None
+    if annotation and "mask_path" in annotation:
+        reference_mask = cv2.imread(annotation["mask_path"], cv2.IMREAD_GRAYSCALE)
+        reference_mask = cv2.resize(
+            reference_mask, (w, h), interpolation=cv2.INTER_NEAREST
+        )
+        reference_mask = cv2.threshold(reference_mask, 127, 255, cv2.THRESH_BINARY)[1]
+
+    rows = []
+    # Nested so that only the current threshold, morph and contour results
+    # are alive; each combination is charged the full time of its stages
+    for t_key in itertools.product(
+        grid["blur_size"], grid["block_size"], grid["threshold_c"]
+    ):
+        thresh, thresh_seconds = timed(threshold_image, img, *t_key)
+        for morph_kernel_size in grid["morph_kernel_size"]:
+            morph, morph_seconds = timed(close_open, thresh, morph_kernel_size)
+            contours, contour_seconds = timed(find_contours, morph)
+            stage_seconds = thresh_seconds + morph_seconds + contour_seconds
+
+            for min_wall_area in grid["min_wall_area"]:
+                params = dict(
+                    zip(PARAM_NAMES, t_key + (morph_kernel_size, min_wall_area))
+                )
+                (analysis, wall_mask), build_seconds = timed(
+                    build_analysis,
+                    morph,
+                    contours,
+                    WALL_HEIGHT,
+                    SCALE_FACTOR,
+                    min_wall_area,
+                    wall_mode,
+                )
+                rows.append(
+                    {
+                        "image": os.path.basename(image_path),
+                        "width": w,
+                        "height": h,
+                        "bucket": bucket_for(w, h),
+                        "params": params,
+                        "runtime_ms": round((stage_seconds + build_seconds) * 1000, 2),
+                        "raw_contours": analysis["stats"]["raw_contours"],
+                        "walls": len(analysis["walls"]),
+                        "doors": len(analysis["doors"]),
+                        "windows": len(analysis["windows"]),
+                        "rooms": len(analysis["rooms"]),
+                        "confidence": score_confidence(analysis),
+                        "agreement": (
+                            agreement(analysis, wall_mask, annotation, reference_mask)
+                            if annotation
+                            else None
+                        ),
+                    }
+                )
+
+    print(f"📐 {os.path.basename(image_path)} ({w}x{h}): {len(rows)} combinations")
+    return rows
+
+
+def bucket_metric(rows):
+    """Agreement when every row of a bucket has it, else router confidence.
+
+    A bucket is ranked on one metric only: the two scores are on different
+    scales, so a mean that mixes them would favour whichever images happen
+    to be annotated.
+    """
+    if all(row["agreement"] is not None for row in rows):
+        return "agreement"
+    return "confidence"
+
+
+def recommend(rows):
+    """Best parameter set per resolution bucket, averaged over its images."""
+    presets = []
+    for name, max_side in RESOLUTION_BUCKETS:
+        bucket_rows = [row for row in rows if row["bucket"] == name]
+        if not bucket_rows:
+            continue
+        metric = bucket_metric(bucket_rows)
+        by_params = {}
+        for row in bucket_rows:
+            key = tuple(row["params"][p] for p in PARAM_NAMES)
+            by_params.setdefault(key, []).append(row)
+
+        summaries = []
+        for key, group in by_params.items():
+            summaries.append(
+                {
+                    "params": dict(zip(PARAM_NAMES, key)),
+                    "images": len(group),
+                    "mean_quality": sum(r[metric] for r in group) / len(group),
+                    "mean_runtime_ms": sum(r["runtime_ms"] for r in group) / len(group),
+                    "mean_raw_contours": sum(r["raw_contours"] for r in group)
+                    / len(group),
+                }
+            )
+        top = max(s["mean_quality"] for s in summaries)
+        best = min(
+            (s for s in summaries if s["mean_quality"] >= top - QUALITY_TOLERANCE),
+            key=lambda s: s["mean_runtime_ms"],
+        )
+        presets.append(
+            {
+                "name": name,
+                "max_side": max_side,
+                "params": best["params"],
+                "images": best["images"],
+                "metric": metric,
+                "mean_quality": round(best["mean_quality"], 3),
+                "mean_runtime_ms": round(best["mean_runtime_ms"], 2),
+                "mean_raw_contours": round(best["mean_raw_contours"], 1),
+            }
+        )
+    return presets
+
+
+def corpus_images(corpus):
+    return sorted(
+        os.path.join(corpus, name)
+        for name in os.listdir(corpus)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Tune image-analysis parameters over a plan corpus"
+    )
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--annotations", help="Directory of reference annotations")
+    # Each worker holds one full-resolution image and its current masks
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 2))
+    parser.add_argument("--wall-mode", choices=["contours", "segments"], default="contours")
+    parser.add_argument("--output", default=PRESETS_PATH, help="Presets JSON to write")
+    parser.add_argument("--report", help="Also write every result row to this JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    images = corpus_images(args.corpus)
+    if not images:
+        raise SystemExit(f"No images found in {args.corpus}")
+
+    started = time.time()
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                sweep_image,
+                path,
+                GRID,
+                args.wall_mode,
+                load_annotation(args.annotations, path),
+            )
+            for path in images
+        ]
+        for path, future in zip(images, futures):
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"⚠️ Skipping {os.path.basename(path)}: {e}")
+
+    presets = recommend(rows)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "wall_mode": args.wall_mode,
+                "defaults": DEFAULT_PARAMS,
+                "presets": presets,
+            },
+            f,
+            indent=2,
+        )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    for preset in presets:
+        print(
+            f"✅ {preset['name']} (≤{preset['max_side'] or '∞'} px, "
+            f"{preset['images']} images): {preset['params']} "
+            f"quality={preset['mean_quality']} "
+            f"runtime={preset['mean_runtime_ms']}ms"
+        )
+    print(f"💾 Wrote {args.output} in {time.time() - started:.1f}s")
@@ -0,0 +1,152 @@
+import math
+
+import cv2
+import numpy as np
+
+# Merge tolerances, in pixels / degrees
+ANGLE_TOLERANCE_DEG = 3.0
+OFFSET_TOLERANCE = 4.0
+GAP_TOLERANCE = 8.0
+# Snap walls this close to horizontal/vertical onto the axis
+AXIS_SNAP_DEG = 3.0
+# Drop segments thicker than this multiple of the median wall thickness
+MAX_THICKNESS_RATIO = 3.0
+
+
+# ---------- SKELETON ----------
+
+def skeletonize(mask):
+    """One-pixel-wide centerlines of a binary mask."""
+    if hasattr(cv2, "ximgproc"):
+        return cv2.ximgproc.thinning(mask)
+
+    # Morphological skeleton; iterations only scale with wall thickness
+    elem = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+    skel = np.zeros_like(mask)
+    img = mask.copy()
+    while cv2.countNonZero(img):
+        eroded = cv2.erode(img, elem)
+        skel |= cv2.subtract(img, cv2.dilate(eroded, elem))
+        img = eroded
+    return skel
+
+
+# ---------- COLLINEAR MERGING ----------
+
+def _snap_angle(theta):
+    tol = math.radians(AXIS_SNAP_DEG)
+    for axis in (0.0, math.pi / 2, math.pi):
+        if abs(theta - axis) < tol:
+            return axis % math.pi
+    return theta
+
+
+def merge_collinear(segments):
+    """Merge Hough fragments lying on the same line into single segments.
+
+    ``segments`` is an ``(N, 4)`` array of ``x1, y1, x2, y2``. Fragments are
+    clustered by direction and perpendicular offset, projected onto the
+    cluster line, and overlapping or nearly touching spans are joined.
+    """
+    angle_tol = math.radians(ANGLE_TOLERANCE_DEG)
+    clusters = []  # [theta, offset, [(t0, t1), ...]]
+
+    lengths = np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1])
+    order = np.argsort(-lengths)
+    for x1, y1, x2, y2 in segments[order]:
+        theta = _snap_angle(math.atan2(y2 - y1, x2 - x1) % math.pi)
+
+        for cluster in clusters:
+            diff = abs(theta - cluster[0])
+            if min(diff, math.pi - diff) > angle_tol:
+                continue
+            d = (math.cos(cluster[0]), math.sin(cluster[0]))
+            n = (-d[1], d[0])
+            offset = n[0] * (x1 + x2) / 2 + n[1] * (y1 + y2) / 2
+            if abs(offset - cluster[1]) > OFFSET_TOLERANCE:
+                continue
+            t0 = d[0] * x1 + d[1] * y1
+            t1 = d[0] * x2 + d[1] * y2
+            cluster[2].append((min(t0, t1), max(t0, t1)))
+            break
+        else:
+            d = (math.cos(theta), math.sin(theta))
+            n = (-d[1], d[0])
+            t0 = d[0] * x1 + d[1] * y1
+            t1 = d[0] * x2 + d[1] * y2
+            clusters.append(
+                [theta, n[0] * x1 + n[1] * y1, [(min(t0, t1), max(t0, t1))]]
+            )
+
+    merged = []
+    for theta, offset, spans in clusters:
+        d = np.array([math.cos(theta), math.sin(theta)])
+        n = np.array([-d[1], d[0]])
+        spans.sort()
+        start, end = spans[0]
+        for t0, t1 in spans[1:]:
+            if t0 <= end + GAP_TOLERANCE:
+                end = max(end, t1)
+                continue
+            merged.append(np.concatenate([offset * n + start * d, offset * n + end * d]))
+            start, end = t0, t1
+        merged.append(np.concatenate([offset * n + start * d, offset * n + end * d]))
+
+    return np.array(merged, dtype=np.float64).reshape(-1, 4)
+
+
+# ---------- EXTRACTION ----------
+
+def extract_wall_segments(mask, min_length=None):
+    """Extract wall centerlines and thicknesses from a binary wall mask.
+
+    Returns a list of ``(x1, y1, x2, y2, thickness)`` tuples in pixels. Each
+    segment is extended by half its thickness at both ends so that boxes
+    extruded from neighbouring segments close their corners.
+    """
+    h, w = mask.shape[:2]
+    if min_length is None:
+        min_length = max(8.0, 0.015 * max(w, h))
+
+    skel = skeletonize(mask)
+    lines = cv2.HoughLinesP(
+        skel,
+        rho=1,
+        theta=np.pi / 180,
+        threshold=10,
+        minLineLength=min_length / 2,
+        maxLineGap=4,
+    )
+    if lines is None:
+        return []
+
+    segments = merge_collinear(lines.reshape(-1, 4).astype(np.float64))
+    dist = cv2.distanceTransform(mask, cv2.DIST_L2, 3)
+
+    walls = []
+    for x1, y1, x2, y2 in segments:
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length < min_length:
+            continue
+
+        # Distance-to-background along the centerline is half the thickness
+        ts = np.linspace(0.1, 0.9, 9)
+        xs = np.clip(np.round(x1 + ts * (x2 - x1)).astype(int), 0, w - 1)
+        ys = np.clip(np.round(y1 + ts * (y2 - y1)).astype(int), 0, h - 1)
+        thickness = max(1.0, 2.0 * float(np.median(dist[ys, xs])))
+
+        ext = thickness / 2.0 / length
+        walls.append(
+            (
+                x1 - (x2 - x1) * ext,
+                y1 - (y2 - y1) * ext,
+                x2 + (x2 - x1) * ext,
+                y2 + (y2 - y1) * ext,
+                thickness,
+            )
+        )
+    if walls:
+        # Filled blobs (text, symbols) skeletonize into very "thick" walls
+        typical = float(np.median([wall[4] for wall in walls]))
+        walls = [wall for wall in walls if wall[4] <= MAX_THICKNESS_RATIO * typical]
+    return walls